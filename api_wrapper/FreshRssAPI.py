@@ -1,114 +1,390 @@
 #https://github.com/FreshRSS/FreshRSS/blob/edge/p/api/fever.php
-import requests, hashlib
+import hashlib, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal
 from .utils import ApiException
+from .transport import Transport, AsyncTransport, get_default_transport, get_default_async_transport
+from .decoding import loads, decode
+from .models import FeverItem, FeverFeed
+
+ApiException = ApiException.for_api("FreshRssAPI")
+
+MarkAs = Literal["read", "unread", "saved", "unsaved"]
+MarkAs_Labels = {
+    "read": "read",
+    "unread": "unread",
+    "saved": "starred",
+    "unsaved": "unstarred"
+}
+
+
+class FeedGraph:
+    def __init__(self, data:dict):
+        self.fetched_at = time.monotonic()
+        self.groups = {group["id"]: group for group in data.get("groups", [])}
+        self.feeds = {feed["id"]: feed for feed in data.get("feeds", [])}
+        self.group_feeds = {}
+        self.feed_group = {}
+        for feed_group in data.get("feeds_groups", []):
+            feed_ids = [int(feed_id) for feed_id in feed_group["feed_ids"].split(",") if feed_id]
+            self.group_feeds[feed_group["group_id"]] = feed_ids
+            for feed_id in feed_ids:
+                self.feed_group[feed_id] = feed_group["group_id"]
+        self.feed_by_url = {feed["url"]: feed for feed in self.feeds.values() if feed.get("url")}
+        for feed in self.feeds.values():
+            feed["group_id"] = self.feed_group.get(feed["id"])
+        for group in self.groups.values():
+            group["feed_ids"] = [self.group_feeds[group["id"]]] if group["id"] in self.group_feeds else []
+
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+
+    def get_feeds(self, typed:bool=False, fields:tuple=None):
+        if typed or fields is not None:
+            fields = FeverFeed.project(fields)
+            return [FeverFeed.from_dict(feed, fields) for feed in self.feeds.values()]
+        return list(self.feeds.values())
+
+
+    def get_categories(self):
+        return list(self.groups.values())
+
+
+    def get_feed(self, feed_id:int=None, url:str=None):
+        if url is not None:
+            return self.feed_by_url.get(url)
+        return self.feeds.get(int(feed_id))
+
+
+    def get_category_feeds(self, category_id:int):
+        return [self.feeds[feed_id] for feed_id in self.group_feeds.get(int(category_id), []) if feed_id in self.feeds]
+
+
+    def get_category_feed_ids(self, category_ids):
+        category_ids = _id_set(category_ids)
+        return {feed_id for category_id in category_ids for feed_id in self.group_feeds.get(category_id, [])}
+
+
+def _parse_id_list(item_ids:str):
+    return [item_id for item_id in item_ids.split(",")]
+
+
+def _first_item(data:dict):
+    if len(data["items"]) > 0:
+        return data["items"][0]
+    return data["items"]
+
+
+def _id_set(ids):
+    if ids is None:
+        return None
+    if type(ids) == int or type(ids) == str:
+        ids = str(ids).split(",")
+    return {int(item_id) for item_id in ids if item_id != ""}
+
+
+def _items_url(base_url:str, feed_ids:list=None, category_ids:list=None):
+    url = f"{base_url}&items"
+    if feed_ids:
+        if type(feed_ids) != int and type(feed_ids) != str:
+            feed_ids = ",".join(map(str, feed_ids))
+        url += f"&feed_ids={feed_ids}"
+    if category_ids:
+        if type(category_ids) != int and type(category_ids) != str:
+            category_ids = ",".join(map(str, category_ids))
+        url += f"&group_ids={category_ids}"
+    return url
+
+
+def _item_value(item, name:str):
+    return item[name] if isinstance(item, dict) else getattr(item, name)
+
+
+def _decode_items(content:bytes, typed:bool, fields:tuple):
+    if not typed and fields is None:
+        return loads(content)["items"]
+    if fields is not None:
+        # the filters and paging read these, so they are always kept
+        fields = tuple(dict.fromkeys((*fields, "id", "feed_id", "is_read", "is_saved")))
+    return decode(content, FeverItem, fields, key="items")["items"]
+
+
+def _filter_items(items:list, id_only:bool=False, read:bool=None, starred:bool=None):
+    if read == True:
+        items = [item for item in items if _item_value(item, "is_read") == 1]
+    elif read == False:
+        items = [item for item in items if _item_value(item, "is_read") == 0]
+
+    if starred == True:
+        items = [item for item in items if _item_value(item, "is_saved") == 1]
+    elif starred == False:
+        items = [item for item in items if _item_value(item, "is_saved") == 0]
+
+    if id_only:
+        return [_item_value(item, "id") for item in items]
+    return items
 
-ApiException.set_api_name("FreshRssAPI")
 
 class FreshRssAPI:
-    def __init__(self, base_url:str, username:str, password:str):
+    def __init__(self, base_url:str, username:str, password:str, transport:Transport=None, cache_ttl:float=None):
+        # cache_ttl: seconds the feed/category graph is reused, None reloads it on every call
         base_url = base_url.removesuffix('/api/fever.php?api')
         self.base_url = base_url + "/api/fever.php?api"
         self.api_key = hashlib.md5(f"{username}:{password}".encode()).hexdigest()
         self.payload = {
             "api_key": self.api_key
         }
+        self.transport = transport or get_default_transport()
+        self.cache_ttl = cache_ttl
+        self._feed_graph = None
 
     
     def get_starred_item_ids(self):
-        response = requests.post(f"{self.base_url}&saved_item_ids", data=self.payload)
+        response = self.transport.post(f"{self.base_url}&saved_item_ids", data=self.payload, idempotent=True)
         if response.status_code >= 300:
             raise ApiException(f'Failed to get saved item IDs: {response.text}')
-        data = response.json()
-        items = data["saved_item_ids"]
-        items = [item_id for item_id in items.split(",")]
-        return items
+        return _parse_id_list(loads(response.content)["saved_item_ids"])
     
-    def get_feeds(self):
-        response = requests.post(f"{self.base_url}&feeds", data=self.payload)
+    def get_unread_item_ids(self):
+        response = self.transport.post(f"{self.base_url}&unread_item_ids", data=self.payload, idempotent=True)
         if response.status_code >= 300:
-            raise ApiException(f'Failed to get feeds: {response.text}')
-        data = response.json()
-        feed_groups = data["feeds_groups"]
-        feed_groups = [{"group_id": group["group_id"], "feed_ids": [int(feed_id) for feed_id in group["feed_ids"].split(",")]} for group in feed_groups]
-        for feed in data["feeds"]:
-            feed["group_id"] = next(group["group_id"] for group in feed_groups if feed["id"] in group["feed_ids"])
-        return data["feeds"]
+            raise ApiException(f'Failed to get unread item IDs: {response.text}')
+        return _parse_id_list(loads(response.content)["unread_item_ids"])
     
-    def get_categories(self):
-        response = requests.post(f"{self.base_url}&groups", data=self.payload)
+    def get_feed_graph(self, refresh:bool=False):
+        graph = self._feed_graph
+        if graph is not None and not refresh and self.cache_ttl is not None and graph.age() < self.cache_ttl:
+            return graph
+        response = self.transport.post(f"{self.base_url}&groups&feeds", data=self.payload, idempotent=True)
         if response.status_code >= 300:
-            raise ApiException(f'Failed to get categories: {response.text}')
-        data = response.json()
-        feed_groups = data["feeds_groups"]
-        feed_groups = [{"group_id": group["group_id"], "feed_ids": [int(feed_id) for feed_id in group["feed_ids"].split(",")]} for group in feed_groups]
-        print(feed_groups)
-        for group in data["groups"]:
-            group["feed_ids"] = [feed_group["feed_ids"] for feed_group in feed_groups if feed_group["group_id"] == group["id"]]
-        return data["groups"]
+            raise ApiException(f'Failed to get feeds and categories: {response.text}')
+        graph = FeedGraph(loads(response.content))
+        if self.cache_ttl is not None:
+            self._feed_graph = graph
+        return graph
+
+    def invalidate_cache(self):
+        self._feed_graph = None
     
-    def get_items(self, feed_ids:list=None, category_ids:list=None, id_only:bool=False, read:bool=None, starred:bool=None):
-        url = f"{self.base_url}&items"
-        if feed_ids:
-            if type(feed_ids) != int and type(feed_ids) != str:
-                feed_ids = ",".join(map(str, feed_ids))
-                print(feed_ids)
-            url += f"&feed_ids={feed_ids}"
-        if category_ids:
-            if type(category_ids) != int and type(category_ids) != str:
-                category_ids = ",".join(map(str, category_ids))
-            url += f"&group_ids={category_ids}"
+    def get_feeds(self, typed:bool=False, fields:tuple=None):
+        return self.get_feed_graph().get_feeds(typed, fields)
+    
+    def get_categories(self):
+        return self.get_feed_graph().get_categories()
 
-        response = requests.post(url, data=self.payload)
+    def get_feed(self, feed_id:int=None, url:str=None):
+        return self.get_feed_graph().get_feed(feed_id, url)
+
+    def get_category_feeds(self, category_id:int):
+        return self.get_feed_graph().get_category_feeds(category_id)
+    
+    def get_items(self, feed_ids:list=None, category_ids:list=None, id_only:bool=False, read:bool=None, starred:bool=None, typed:bool=False, fields:tuple=None):
+        # typed: return FeverItem records instead of dicts, fields: record attributes to decode (implies typed)
+        url = _items_url(self.base_url, feed_ids, category_ids)
+        response = self.transport.post(url, data=self.payload, idempotent=True)
         if response.status_code >= 300:
             raise ApiException(f'Failed to get feed items: {response.text}')
-        data = response.json()
-        if read == True:
-            data["items"] = [item for item in data["items"] if item["is_read"] == 1]
-        elif read == False:
-            data["items"] = [item for item in data["items"] if item["is_read"] == 0]
+        return _filter_items(_decode_items(response.content, typed, fields), id_only, read, starred)
+    
+    def iter_items(self, feed_ids:list=None, category_ids:list=None, id_only:bool=False, read:bool=None, starred:bool=None, since_id:int=None, max_id:int=None, max_workers:int=4, typed:bool=False, fields:tuple=None):
+        # yields oldest first, paging with since_id which the fever api answers in ascending id order; max_id is applied locally
+        # unread/starred filters resolve candidate ids first and fetch them in parallel chunks of 50
+        if read == False or starred == True:
+            yield from self.__iter_candidate_items(feed_ids, category_ids, id_only, read, starred, since_id, max_id, max_workers, typed, fields)
+            return
+        since_id = int(since_id or 0)
+        while True:
+            url = _items_url(self.base_url, feed_ids, category_ids) + f"&since_id={since_id}"
+            items = self.__fetch_items(url, typed, fields)
+            if not items:
+                return
+            items.sort(key=lambda item: int(_item_value(item, "id")))
+            since_id = int(_item_value(items[-1], "id"))
+            if max_id:
+                items = [item for item in items if int(_item_value(item, "id")) < int(max_id)]
+            yield from _filter_items(items, id_only, read, starred)
+            if max_id and since_id >= int(max_id) - 1:
+                return
 
+    def __iter_candidate_items(self, feed_ids, category_ids, id_only, read, starred, since_id, max_id, max_workers, typed, fields):
+        candidates = None
+        if read == False:
+            candidates = _id_set(self.get_unread_item_ids())
         if starred == True:
-            data["items"] = [item for item in data["items"] if item["is_saved"] == 1]
-        elif starred == False:
-            data["items"] = [item for item in data["items"] if item["is_saved"] == 0]
+            starred_ids = _id_set(self.get_starred_item_ids())
+            candidates = starred_ids if candidates is None else candidates & starred_ids
+        candidates = sorted((item_id for item_id in candidates if (not since_id or item_id > int(since_id)) and (not max_id or item_id < int(max_id))))
+
+        allowed_feeds = _id_set(feed_ids)
+        if category_ids:
+            category_feeds = self.get_feed_graph().get_category_feed_ids(category_ids)
+            allowed_feeds = category_feeds if allowed_feeds is None else allowed_feeds | category_feeds
+
+        chunks = iter([candidates[start:start + 50] for start in range(0, len(candidates), 50)])
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            def schedule():
+                chunk = next(chunks, None)
+                if chunk:
+                    pending.append(executor.submit(self.__fetch_items, f"{self.base_url}&items&with_ids={','.join(map(str, chunk))}", typed, fields))
+
+            try:
+                for _ in range(max_workers):
+                    schedule()
+                while pending:
+                    items = pending.popleft().result()
+                    schedule()
+                    if allowed_feeds is not None:
+                        items = [item for item in items if int(_item_value(item, "feed_id")) in allowed_feeds]
+                    items.sort(key=lambda item: int(_item_value(item, "id")))
+                    yield from _filter_items(items, id_only, read, starred)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def __fetch_items(self, url:str, typed:bool=False, fields:tuple=None):
+        response = self.transport.post(url, data=self.payload, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get feed items: {response.text}')
+        return _decode_items(response.content, typed, fields)
 
-        if id_only:
-            return [item["id"] for item in data["items"]]
-        return data["items"]
-    
     def get_item(self, item_id:list):
         if type(item_id) != int and type(item_id) != str:
             item_id = ",".join(map(str, item_id))
-        response = requests.post(f"{self.base_url}&items&with_ids={item_id}", data=self.payload)
+        response = self.transport.post(f"{self.base_url}&items&with_ids={item_id}", data=self.payload, idempotent=True)
         if response.status_code >= 300:
             raise ApiException(f'Failed to get item details: {response.text}')
-        data = response.json()
-        if len(data["items"]) > 0:
-            return data["items"][0]
-        return data["items"]
+        return _first_item(loads(response.content))
     
     # Actions
     
     def mark_item_as_read(self, item_id:int):
-        response = requests.post(f"{self.base_url}&mark=item&as=read&id={item_id}", data=self.payload)
+        response = self.transport.post(f"{self.base_url}&mark=item&as=read&id={item_id}", data=self.payload, idempotent=True)
         if response.status_code >= 300:
             raise ApiException(f'Failed to mark item as read: {response.text}')
-        return response.json()
+        return loads(response.content)
     
     def mark_item_as_unread(self, item_id:int):
-        response = requests.post(f"{self.base_url}&mark=item&as=unread&id={item_id}", data=self.payload)
+        response = self.transport.post(f"{self.base_url}&mark=item&as=unread&id={item_id}", data=self.payload, idempotent=True)
         if response.status_code >= 300:
             raise ApiException(f'Failed to mark item as unread: {response.text}')
-        return response.json()
+        return loads(response.content)
     
     def mark_item_as_starred(self, item_id:int):
-        response = requests.post(f"{self.base_url}&mark=item&as=saved&id={item_id}", data=self.payload)
+        response = self.transport.post(f"{self.base_url}&mark=item&as=saved&id={item_id}", data=self.payload, idempotent=True)
         if response.status_code >= 300:
             raise ApiException(f'Failed to mark item as starred: {response.text}')
-        return response.json()
+        return loads(response.content)
     
     def mark_item_as_unstarred(self, item_id:int):
-        response = requests.post(f"{self.base_url}&mark=item&as=unsaved&id={item_id}", data=self.payload)
+        response = self.transport.post(f"{self.base_url}&mark=item&as=unsaved&id={item_id}", data=self.payload, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to mark item as unstarred: {response.text}')
+        return loads(response.content)
+    
+    def mark_items(self, item_ids:list, mark_as:MarkAs="read", max_workers:int=8):
+        # one request per item (fever has no multi-id mark), returns {item_id: {'status': ..., 'result' | 'error': ...}}
+        report = {}
+        def mark(item_id):
+            response = self.transport.post(f"{self.base_url}&mark=item&as={mark_as}&id={item_id}", data=self.payload, idempotent=True)
+            if response.status_code >= 300:
+                raise ApiException(f'Failed to mark item as {MarkAs_Labels[mark_as]}: {response.text}')
+            return loads(response.content)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(mark, item_id): item_id for item_id in item_ids}
+            for future, item_id in futures.items():
+                try:
+                    report[item_id] = {'status': 'success', 'result': future.result()}
+                except Exception as e:
+                    report[item_id] = {'status': 'failed', 'error': str(e)}
+        return report
+    
+    def mark_feed_as_read(self, feed_id:int, before:int=None):
+        # marks every item of the feed older than `before` (unix timestamp, default now) as read in one request
+        before = int(time.time()) if before is None else int(before)
+        response = self.transport.post(f"{self.base_url}&mark=feed&as=read&id={feed_id}&before={before}", data=self.payload, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to mark feed as read: {response.text}')
+        return loads(response.content)
+    
+    def mark_category_as_read(self, category_id:int, before:int=None):
+        before = int(time.time()) if before is None else int(before)
+        response = self.transport.post(f"{self.base_url}&mark=group&as=read&id={category_id}&before={before}", data=self.payload, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to mark category as read: {response.text}')
+        return loads(response.content)
+
+
+class AsyncFreshRssAPI:
+    def __init__(self, base_url:str, username:str, password:str, transport:AsyncTransport=None):
+        base_url = base_url.removesuffix('/api/fever.php?api')
+        self.base_url = base_url + "/api/fever.php?api"
+        self.api_key = hashlib.md5(f"{username}:{password}".encode()).hexdigest()
+        self.payload = {
+            "api_key": self.api_key
+        }
+        self.transport = transport or get_default_async_transport()
+
+
+    async def get_starred_item_ids(self):
+        response = await self.transport.post(f"{self.base_url}&saved_item_ids", data=self.payload, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get saved item IDs: {response.text}')
+        return _parse_id_list(loads(response.content)["saved_item_ids"])
+
+    async def get_feeds(self, typed:bool=False, fields:tuple=None):
+        response = await self.transport.post(f"{self.base_url}&feeds", data=self.payload, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get feeds: {response.text}')
+        return FeedGraph(loads(response.content)).get_feeds(typed, fields)
+
+    async def get_categories(self):
+        response = await self.transport.post(f"{self.base_url}&groups", data=self.payload, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get categories: {response.text}')
+        return FeedGraph(loads(response.content)).get_categories()
+
+    async def get_items(self, feed_ids:list=None, category_ids:list=None, id_only:bool=False, read:bool=None, starred:bool=None, typed:bool=False, fields:tuple=None):
+        url = _items_url(self.base_url, feed_ids, category_ids)
+        response = await self.transport.post(url, data=self.payload, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get feed items: {response.text}')
+        return _filter_items(_decode_items(response.content, typed, fields), id_only, read, starred)
+
+    async def get_item(self, item_id:list):
+        if type(item_id) != int and type(item_id) != str:
+            item_id = ",".join(map(str, item_id))
+        response = await self.transport.post(f"{self.base_url}&items&with_ids={item_id}", data=self.payload, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get item details: {response.text}')
+        return _first_item(loads(response.content))
+
+    # Actions
+
+    async def mark_item_as_read(self, item_id:int):
+        response = await self.transport.post(f"{self.base_url}&mark=item&as=read&id={item_id}", data=self.payload, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to mark item as read: {response.text}')
+        return loads(response.content)
+
+    async def mark_item_as_unread(self, item_id:int):
+        response = await self.transport.post(f"{self.base_url}&mark=item&as=unread&id={item_id}", data=self.payload, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to mark item as unread: {response.text}')
+        return loads(response.content)
+
+    async def mark_item_as_starred(self, item_id:int):
+        response = await self.transport.post(f"{self.base_url}&mark=item&as=saved&id={item_id}", data=self.payload, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to mark item as starred: {response.text}')
+        return loads(response.content)
+
+    async def mark_item_as_unstarred(self, item_id:int):
+        response = await self.transport.post(f"{self.base_url}&mark=item&as=unsaved&id={item_id}", data=self.payload, idempotent=True)
         if response.status_code >= 300:
             raise ApiException(f'Failed to mark item as unstarred: {response.text}')
-        return response.json()
\ No newline at end of file
+        return loads(response.content)
\ No newline at end of file
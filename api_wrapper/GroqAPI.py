@@ -1,11 +1,404 @@
 # https://console.groq.com/docs/quickstart
-import requests
+import hashlib, json, os, random, re, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from .utils import ApiException
+from .transport import Transport, AsyncTransport, get_default_transport, get_default_async_transport
+from .decoding import loads
+
+ApiException = ApiException.for_api("GroqAPI")
+
+
+def _chat_completion_data(client, messages:list, model_id:str=None, temperature:float =None, max_tokens:int=None):
+    model_id = model_id or client.model_id
+    if not model_id:
+        raise ApiException(f'Please provide a model-ID (https://console.groq.com/docs/models)')
+    roles = {message.get('role') for message in messages}
+    if 'system' not in roles or 'user' not in roles:
+        raise ApiException(f'Please provide at least one message with role "system" or "user"')
+
+    return {
+        'model': model_id,
+        'messages': messages,
+        # explicit None checks so temperature=0 is sent instead of falling back to the server default
+        **({'temperature': temperature if temperature is not None else client.temperature} if temperature is not None or client.temperature is not None else {}),
+        **({'max_tokens': max_tokens or client.max_tokens} if max_tokens or client.max_tokens else {})
+    }
+
+
+def _cache_key(cache, data:dict):
+    if cache is None or not cache.cacheable(data):
+        return None
+    return cache.key(data)
+
+
+def _sse_events(lines):
+    data = []
+    for line in lines:
+        if line.startswith('data:'):
+            data.append(line[5:].strip())
+        elif not line and data:
+            yield '\n'.join(data)
+            data = []
+    if data:
+        yield '\n'.join(data)
+
+
+async def _async_sse_events(lines):
+    data = []
+    async for line in lines:
+        if line.startswith('data:'):
+            data.append(line[5:].strip())
+        elif not line and data:
+            yield '\n'.join(data)
+            data = []
+    if data:
+        yield '\n'.join(data)
+
+
+class _ChatCompletionAssembler:
+    def __init__(self):
+        self.id = None
+        self.model = None
+        self.content = []
+        self.role = 'assistant'
+        self.finish_reason = None
+        self.usage = None
+        self.done = False
+
+
+    def feed(self, event:str):
+        # returns the content delta of one server-sent event, None if it carried none
+        if event == '[DONE]':
+            self.done = True
+            return None
+        chunk = json.loads(event)
+        if 'error' in chunk:
+            raise ApiException(f'Failed to get chat completion: {chunk["error"]}')
+        self.id = chunk.get('id', self.id)
+        self.model = chunk.get('model', self.model)
+        self.usage = chunk.get('usage') or chunk.get('x_groq', {}).get('usage') or self.usage
+        delta = None
+        for choice in chunk.get('choices', []):
+            self.finish_reason = choice.get('finish_reason') or self.finish_reason
+            self.role = choice.get('delta', {}).get('role', self.role)
+            delta = choice.get('delta', {}).get('content')
+            if delta:
+                self.content.append(delta)
+        return delta or None
+
+
+    @property
+    def message(self):
+        return {'role': self.role, 'content': ''.join(self.content)}
+
+
+    @property
+    def response(self):
+        # same shape as the non-streaming chat_completion result
+        return {
+            'id': self.id,
+            'object': 'chat.completion',
+            'model': self.model,
+            'choices': [{'index': 0, 'message': self.message, 'finish_reason': self.finish_reason}],
+            'usage': self.usage
+        }
+
+
+class ChatCompletionStream(_ChatCompletionAssembler):
+    def __init__(self, response):
+        super().__init__()
+        self._response = response
+
+
+    def __iter__(self):
+        try:
+            for event in _sse_events(self._response.iter_lines()):
+                delta = self.feed(event)
+                if delta:
+                    yield delta
+                if self.done:
+                    break
+        finally:
+            self.close()
+
+
+    def read(self):
+        for _ in self:
+            pass
+        return self.response
+
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class AsyncChatCompletionStream(_ChatCompletionAssembler):
+    def __init__(self, response):
+        super().__init__()
+        self._response = response
+
+
+    async def __aiter__(self):
+        try:
+            async for event in _async_sse_events(self._response.iter_lines()):
+                delta = self.feed(event)
+                if delta:
+                    yield delta
+                if self.done:
+                    break
+        finally:
+            # also runs on cancellation, so an abandoned stream releases its connection
+            await self.aclose()
+
+
+    async def read(self):
+        async for _ in self:
+            pass
+        return self.response
+
+
+    async def aclose(self):
+        if self._response is not None:
+            response, self._response = self._response, None
+            await response.aclose()
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+
+class CompletionCache:
+    def __init__(self, max_entries:int=1024, ttl:float=None, path:str=None, max_disk_entries:int=None, cache_nondeterministic:bool=False):
+        # memory tier is an LRU of max_entries, the optional sqlite file at `path` survives restarts
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.cache_nondeterministic = cache_nondeterministic
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._db = None
+        if path:
+            import sqlite3
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, created REAL NOT NULL, last_used REAL NOT NULL, value TEXT NOT NULL)")
+            self._db.commit()
+
+
+    @staticmethod
+    def key(data:dict):
+        return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()).hexdigest()
+
+
+    def cacheable(self, data:dict):
+        # groq samples with temperature 1 when none is sent, so only an explicit 0 is deterministic
+        return self.cache_nondeterministic or data.get('temperature') == 0
+
+
+    def get(self, key:str):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self.__expired(entry[0], now):
+                self._memory.move_to_end(key)
+                self._stats['hits'] += 1
+                self._stats['memory_hits'] += 1
+                return json.loads(entry[1])
+            if entry is not None:
+                del self._memory[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT created, value FROM completions WHERE key = ?", (key,)).fetchone()
+                if row is not None and not self.__expired(row[0], now):
+                    self._db.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self.__remember(key, row[0], row[1])
+                    self._stats['hits'] += 1
+                    self._stats['disk_hits'] += 1
+                    return json.loads(row[1])
+            self._stats['misses'] += 1
+            return None
+
+
+    def set(self, key:str, value:dict):
+        now = time.time()
+        value = json.dumps(value)
+        with self._lock:
+            self.__remember(key, now, value)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO completions (key, created, last_used, value) VALUES (?, ?, ?, ?)", (key, now, now, value))
+                if self.ttl is not None:
+                    self._db.execute("DELETE FROM completions WHERE created < ?", (now - self.ttl,))
+                if self.max_disk_entries is not None:
+                    self._db.execute("DELETE FROM completions WHERE key NOT IN (SELECT key FROM completions ORDER BY last_used DESC LIMIT ?)", (self.max_disk_entries,))
+                self._db.commit()
+
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+            if self._db is not None:
+                stats['disk_entries'] = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+            return stats
+
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM completions")
+                self._db.commit()
+
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+    def __expired(self, created:float, now:float):
+        return self.ttl is not None and now - created > self.ttl
+
+
+    def __remember(self, key:str, created:float, value:str):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+
+def _parse_duration(value:str):
+    # groq reports resets like "2m59.56s", "7.66s" or "120ms"
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+    parts = re.findall(r'([\d.]+)(ms|h|m|s)', value)
+    return sum(float(amount) * units[unit] for amount, unit in parts) if parts else None
+
+
+class _TokenBucket:
+    def __init__(self, capacity:float=None, refill_rate:float=None):
+        self.capacity = capacity
+        self.level = capacity
+        self.refill_rate = refill_rate
+        self.updated = time.monotonic()
+
+
+    def __refill(self, now:float):
+        if self.capacity is not None and self.refill_rate:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+
+    def wait_time(self, amount:float, now:float):
+        if self.capacity is None:
+            return 0
+        self.__refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0
+        if not self.refill_rate:
+            return 1
+        return (amount - self.level) / self.refill_rate
+
+
+    def take(self, amount:float):
+        if self.capacity is not None:
+            self.level -= min(amount, self.capacity)
+
+
+    def update(self, limit:float, remaining:float, reset:float):
+        # the server state wins over the local estimate, the refill rate is derived from the time until full
+        if limit is None or remaining is None:
+            return
+        self.capacity = limit
+        self.level = remaining
+        self.updated = time.monotonic()
+        if reset and limit > remaining:
+            self.refill_rate = (limit - remaining) / reset
+
+
+class RateLimitScheduler:
+    def __init__(self, requests_per_minute:int=None, tokens_per_minute:int=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._models = {}
+        self._lock = threading.Lock()
+
+
+    def __model(self, model_id:str):
+        if model_id not in self._models:
+            self._models[model_id] = {
+                'requests': _TokenBucket(self.requests_per_minute, self.requests_per_minute / 60 if self.requests_per_minute else None),
+                'tokens': _TokenBucket(self.tokens_per_minute, self.tokens_per_minute / 60 if self.tokens_per_minute else None),
+                'blocked_until': 0
+            }
+        return self._models[model_id]
+
+
+    def acquire(self, model_id:str, tokens:int=1):
+        # blocks until the model has budget for one request of `tokens` tokens
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                state = self.__model(model_id)
+                wait = max(state['blocked_until'] - now, state['requests'].wait_time(1, now), state['tokens'].wait_time(tokens, now))
+                if wait <= 0:
+                    state['requests'].take(1)
+                    state['tokens'].take(tokens)
+                    return
+            time.sleep(wait)
+
+
+    def update(self, model_id:str, headers):
+        def number(name):
+            value = headers.get(name)
+            try:
+                return float(value) if value is not None else None
+            except ValueError:
+                return None
+        with self._lock:
+            state = self.__model(model_id)
+            state['requests'].update(number('x-ratelimit-limit-requests'), number('x-ratelimit-remaining-requests'), _parse_duration(headers.get('x-ratelimit-reset-requests')))
+            state['tokens'].update(number('x-ratelimit-limit-tokens'), number('x-ratelimit-remaining-tokens'), _parse_duration(headers.get('x-ratelimit-reset-tokens')))
+
+
+    def block(self, model_id:str, seconds:float):
+        with self._lock:
+            state = self.__model(model_id)
+            state['blocked_until'] = max(state['blocked_until'], time.monotonic() + seconds)
+
+
+def _estimate_tokens(data:dict):
+    # rough prompt estimate of 4 characters per token plus the completion budget
+    prompt = sum(len(str(message.get('content', ''))) for message in data['messages']) // 4
+    return prompt + (data.get('max_tokens') or 0)
 
-ApiException.set_api_name("GroqAPI")
 
 class GroqAPI:
-    def __init__(self, access_token:str, standard_model_id:str=None, standard_temperature:float=None, standard_max_tokens:int=None):
+    def __init__(self, access_token:str, standard_model_id:str=None, standard_temperature:float=None, standard_max_tokens:int=None, transport:Transport=None, cache:CompletionCache=None):
         self.root_url = "https://api.groq.com/openai/v1"
         self.headers = {
             'Authorization': f'Bearer {access_token}',
@@ -14,32 +407,220 @@ class GroqAPI:
         self.model_id = standard_model_id
         self.temperature = standard_temperature
         self.max_tokens = standard_max_tokens
+        self.transport = transport or get_default_transport()
+        self.cache = cache
+        self.rate_limits = RateLimitScheduler()
 
 
     def get_models(self):
         url = f"{self.root_url}/models"
-        response = requests.get(url, headers=self.headers)
+        response = self.transport.get(url, headers=self.headers)
         if response.status_code >= 300:
             raise ApiException(f'Failed to get models: {response.text}')
-        return response.json()
+        return loads(response.content)
+
 
+    def chat_completion(self, messages:list, model_id:str=None, temperature:float =None, max_tokens:int=None, stream:bool=False):
+        # stream=True returns a ChatCompletionStream yielding content deltas, see its `response` once consumed
+        url = f"{self.root_url}/chat/completions"
+        data = _chat_completion_data(self, messages, model_id, temperature, max_tokens)
+        if stream:
+            response = self.transport.stream("POST", url, headers=self.headers, json={**data, 'stream': True})
+            if response.status_code >= 300:
+                with response:
+                    raise ApiException(f'Failed to get chat completion: {response.text}')
+            return ChatCompletionStream(response)
+        cache_key = _cache_key(self.cache, data)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        response = self.transport.post(url, headers=self.headers, json=data)
+        self.rate_limits.update(data['model'], response.headers)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get chat completion: {response.text}')
+        response = loads(response.content)
+        if cache_key is not None:
+            self.cache.set(cache_key, response)
+        return response
 
-    def chat_completion(self, messages:list, model_id:str=None, temperature:float =None, max_tokens:int=None):
-        model_id = model_id or self.model_id
-        if not model_id:
-            raise ApiException(f'Please provide a model-ID (https://console.groq.com/docs/models)')
-        roles = {message.get('role') for message in messages}
-        if 'system' not in roles or 'user' not in roles:
-            raise ApiException(f'Please provide at least one message with role "system" or "user"')
 
+    def batch_chat_completion(self, messages_list:list, model_id:str=None, temperature:float =None, max_tokens:int=None, max_workers:int=8, max_retries:int=5, return_exceptions:bool=False):
+        # runs concurrently within the rate limits reported by groq, results are returned in input order
         url = f"{self.root_url}/chat/completions"
+
+        def run(messages):
+            data = _chat_completion_data(self, messages, model_id, temperature, max_tokens)
+            cache_key = _cache_key(self.cache, data)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            tokens = _estimate_tokens(data)
+            for attempt in range(max_retries + 1):
+                self.rate_limits.acquire(data['model'], tokens)
+                # the scheduler owns 429 handling, a transport retry would sleep in this worker while the others keep sending
+                response = self.transport.post(url, headers=self.headers, json=data, retry=False)
+                self.rate_limits.update(data['model'], response.headers)
+                if response.status_code == 429 and attempt < max_retries:
+                    retry_after = _parse_duration(response.headers.get('retry-after'))
+                    self.rate_limits.block(data['model'], retry_after if retry_after is not None else min(60, 2 ** attempt) * (0.5 + random.random()))
+                    continue
+                if response.status_code >= 300:
+                    raise ApiException(f'Failed to get chat completion: {response.text}')
+                response = loads(response.content)
+                if cache_key is not None:
+                    self.cache.set(cache_key, response)
+                return response
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(run, messages) for messages in messages_list]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    if not return_exceptions:
+                        for pending in futures:
+                            pending.cancel()
+                        raise
+                    results.append(e)
+            return results
+
+
+    ## Batch jobs
+
+    def upload_batch_file(self, path:str):
+        headers = {key: value for key, value in self.headers.items() if key != 'Content-Type'}
+        # the open file is sent so the JSONL is not loaded a second time (httpx streams it, requests encodes it once),
+        # a one-shot body is not retried by the transport, so a 429 or 5xx here raises
+        with open(path, 'rb') as file:
+            response = self.transport.post(f"{self.root_url}/files", headers=headers, data={'purpose': 'batch'}, files={'file': (os.path.basename(path), file, 'application/jsonl')})
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to upload batch file: {response.text}')
+        return loads(response.content)
+
+
+    def create_batch(self, requests, model_id:str=None, temperature:float =None, max_tokens:int=None, completion_window:str="24h", metadata:dict=None):
+        # requests: iterable of (custom_id, messages), written to a temporary JSONL file one line at a time
+        import tempfile
+        file = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8')
+        try:
+            with file:
+                for custom_id, messages in requests:
+                    line = {
+                        'custom_id': str(custom_id),
+                        'method': 'POST',
+                        'url': '/v1/chat/completions',
+                        'body': _chat_completion_data(self, messages, model_id, temperature, max_tokens)
+                    }
+                    file.write(json.dumps(line) + '\n')
+            input_file = self.upload_batch_file(file.name)
+        finally:
+            os.remove(file.name)
         data = {
-            'model': model_id,
-            'messages': messages,
-            **({'temperature': temperature or self.temperature} if temperature or self.temperature else {}),
-            **({'max_tokens': max_tokens or self.max_tokens} if max_tokens or self.max_tokens else {})
+            'input_file_id': input_file['id'],
+            'endpoint': '/v1/chat/completions',
+            'completion_window': completion_window,
+            **({'metadata': metadata} if metadata else {})
+        }
+        response = self.transport.post(f"{self.root_url}/batches", headers=self.headers, json=data)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to create batch: {response.text}')
+        return loads(response.content)
+
+
+    def get_batch(self, batch_id:str):
+        response = self.transport.get(f"{self.root_url}/batches/{batch_id}", headers=self.headers)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get batch: {response.text}')
+        return loads(response.content)
+
+
+    def cancel_batch(self, batch_id:str):
+        response = self.transport.post(f"{self.root_url}/batches/{batch_id}/cancel", headers=self.headers)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to cancel batch: {response.text}')
+        return loads(response.content)
+
+
+    def wait_for_batch(self, batch_id:str, poll_interval:float=5, max_interval:float=60, timeout:float=None):
+        # polls with exponential backoff until the batch reaches a final status
+        started = time.monotonic()
+        while True:
+            batch = self.get_batch(batch_id)
+            if batch.get('status') in ('completed', 'failed', 'expired', 'cancelled'):
+                return batch
+            if timeout is not None and time.monotonic() - started + poll_interval > timeout:
+                raise ApiException(f'Batch "{batch_id}" did not finish within {timeout} seconds (status: {batch.get("status")})')
+            time.sleep(poll_interval)
+            poll_interval = min(max_interval, poll_interval * 2)
+
+
+    def iter_batch_results(self, batch, include_errors:bool=True):
+        # yields (custom_id, response_body, error) line by line without loading the result file
+        if type(batch) == str:
+            batch = self.get_batch(batch)
+        file_ids = [batch.get('output_file_id')]
+        if include_errors:
+            file_ids.append(batch.get('error_file_id'))
+        for file_id in file_ids:
+            if not file_id:
+                continue
+            with self.transport.stream("GET", f"{self.root_url}/files/{file_id}/content", headers=self.headers) as response:
+                if response.status_code >= 300:
+                    raise ApiException(f'Failed to get batch results: {response.text}')
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    result = json.loads(line)
+                    body = (result.get('response') or {}).get('body')
+                    error = result.get('error')
+                    if error is None and (result.get('response') or {}).get('status_code', 200) >= 300:
+                        error, body = body, None
+                    yield result.get('custom_id'), body, error
+
+
+class AsyncGroqAPI:
+    def __init__(self, access_token:str, standard_model_id:str=None, standard_temperature:float=None, standard_max_tokens:int=None, transport:AsyncTransport=None, cache:CompletionCache=None):
+        self.root_url = "https://api.groq.com/openai/v1"
+        self.headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json'
         }
-        response = requests.post(url, headers=self.headers, json=data)
+        self.model_id = standard_model_id
+        self.temperature = standard_temperature
+        self.max_tokens = standard_max_tokens
+        self.transport = transport or get_default_async_transport()
+        self.cache = cache
+
+
+    async def get_models(self):
+        url = f"{self.root_url}/models"
+        response = await self.transport.get(url, headers=self.headers)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get models: {response.text}')
+        return loads(response.content)
+
+
+    async def chat_completion(self, messages:list, model_id:str=None, temperature:float =None, max_tokens:int=None, stream:bool=False):
+        url = f"{self.root_url}/chat/completions"
+        data = _chat_completion_data(self, messages, model_id, temperature, max_tokens)
+        if stream:
+            response = await self.transport.stream("POST", url, headers=self.headers, json={**data, 'stream': True})
+            if response.status_code >= 300:
+                async with response:
+                    raise ApiException(f'Failed to get chat completion: {await response.read_text()}')
+            return AsyncChatCompletionStream(response)
+        cache_key = _cache_key(self.cache, data)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        response = await self.transport.post(url, headers=self.headers, json=data)
         if response.status_code >= 300:
             raise ApiException(f'Failed to get chat completion: {response.text}')
-        return response.json()
\ No newline at end of file
+        response = loads(response.content)
+        if cache_key is not None:
+            self.cache.set(cache_key, response)
+        return response
\ No newline at end of file
@@ -1,46 +1,454 @@
 # https://developers.home-assistant.io/docs/api/rest/
-import requests
+import codecs, json, math, threading, time
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Literal
 from .utils import ApiException
+from .transport import Transport, AsyncTransport, get_default_transport, get_default_async_transport
+from .decoding import loads, decode
+from .models import HassState
+
+ApiException = ApiException.for_api("HassAPI")
+
+AggregateFunction = Literal["count", "sum", "avg", "min", "max", "list"]
+
+
+def _add_brightness_pct(state:dict):
+    if state['entity_id'].split('.')[0] == 'light':
+        try:
+            brightness = int(state['attributes']['brightness'])
+            brightness_pct = round(brightness / 255 * 100)
+        except:
+            brightness_pct = None
+        state['attributes']['brightness_pct'] = brightness_pct
+    return state
+
+
+def _service_entity_id(domain:str, entity_id:str):
+    if not entity_id.startswith(domain + '.'):
+        entity_id = f"{domain}.{entity_id.rsplit('.', 1)[-1]}"
+    return entity_id
+
+
+def _service_url(base_url:str, service:str, entity_id, service_data:dict):
+    # entity_id may be a single id or a list of ids
+    domain, service_name = service.split('.')
+    url = f"{base_url}/services/{domain}/{service_name}"
+    if entity_id:
+        if type(entity_id) == str:
+            entity_id = _service_entity_id(domain, entity_id)
+        else:
+            entity_id = [_service_entity_id(domain, single_id) for single_id in entity_id]
+        service_data = {**service_data, 'entity_id': entity_id}
+    return url, service_data
+
+
+def aggregate_template(function:AggregateFunction, domain:str=None, attribute:str=None, state:str=None, entity_ids:list=None, where:dict=None):
+    # compiles to a jinja template whose output is JSON, `where` filters on attribute values
+    if entity_ids:
+        selection = f"expand({json.dumps(list(entity_ids))})"
+    elif domain:
+        selection = f"states.{domain}"
+    else:
+        selection = "states"
+    if state is not None:
+        selection += f" | selectattr('state', 'eq', {json.dumps(state)})"
+    for key, value in (where or {}).items():
+        selection += f" | selectattr('attributes.{key}', 'defined') | selectattr('attributes.{key}', 'eq', {json.dumps(value)})"
+
+    if function == "count":
+        return f"{{{{ ({selection} | list | count) | tojson }}}}"
+    if function == "list":
+        return f"{{{{ ({selection} | map(attribute='entity_id') | list) | tojson }}}}"
+    value = f"attributes.{attribute}" if attribute else "state"
+    if attribute:
+        selection += f" | selectattr('{value}', 'defined')"
+    values = f"{{% set values = {selection} | map(attribute='{value}') | select('is_number') | map('float') | list %}}"
+    result = {
+        "sum": "values | sum",
+        "avg": "(values | sum / values | count) if values else none",
+        "min": "values | min if values else none",
+        "max": "values | max if values else none"
+    }[function]
+    return f"{values}{{{{ ({result}) | tojson }}}}"
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class HistoryColumns:
+    # one entity's history as flat arrays: int64 microsecond timestamps, float64 values (NaN if not numeric)
+    # and int32 codes into `categories` for non-numeric states (-1 for numeric ones)
+    __slots__ = ('entity_id', 'timestamps', 'values', 'codes', 'categories', '_category_index')
+
+    def __init__(self, entity_id:str):
+        self.entity_id = entity_id
+        self.timestamps = array('q')
+        self.values = array('d')
+        self.codes = array('i')
+        self.categories = []
+        self._category_index = {}
+
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+    def __category(self, state:str):
+        code = self._category_index.get(state)
+        if code is None:
+            code = self._category_index[state] = len(self.categories)
+            self.categories.append(state)
+        return code
+
+
+    def append(self, timestamp:int, state:str):
+        # numeric states only fill `values`, everything else ("on", "unavailable") is stored as a category code
+        self.timestamps.append(timestamp)
+        try:
+            self.values.append(float(state))
+            self.codes.append(-1)
+        except (TypeError, ValueError):
+            self.values.append(math.nan)
+            self.codes.append(self.__category(state))
+
+
+    def __same_state(self, other:"HistoryColumns", index:int):
+        code = other.codes[index]
+        if code < 0 or self.codes[-1] < 0:
+            return code < 0 and self.codes[-1] < 0 and other.values[index] == self.values[-1]
+        return other.categories[code] == self.categories[self.codes[-1]]
+
+
+    def extend(self, other:"HistoryColumns"):
+        # every window starts with the state carried over from before it, stamped with the window start,
+        # it repeats our last state and is not a change, so it is dropped (as are samples that are not newer)
+        last = self.timestamps[-1] if self.timestamps else None
+        for index in range(len(other)):
+            if index == 0 and last is not None and self.__same_state(other, 0):
+                continue
+            if last is None or other.timestamps[index] > last:
+                code = other.codes[index]
+                self.timestamps.append(other.timestamps[index])
+                self.values.append(other.values[index])
+                self.codes.append(-1 if code < 0 else self.__category(other.categories[code]))
+
+
+    @property
+    def states(self):
+        return [self.categories[code] if code >= 0 else self.values[index] for index, code in enumerate(self.codes)]
+
+
+    def to_numpy(self):
+        import numpy
+        return numpy.frombuffer(self.timestamps, dtype=numpy.int64), numpy.frombuffer(self.values, dtype=numpy.float64)
+
+
+def _as_utc(moment:datetime):
+    # naive datetimes are taken as UTC
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def _timestamp_us(value:str):
+    moment = _as_utc(datetime.fromisoformat(value.replace('Z', '+00:00')))
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def _iter_history_states(chunks):
+    # incremental parse of [[{state}, ...], ...], only one state object is materialized at a time
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    depth = 0
+    entity_id = None
+    for chunk in chunks:
+        buffer = buffer[position:] + (text_decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        position = 0
+        while position < len(buffer):
+            char = buffer[position]
+            if char == '{':
+                try:
+                    state, end = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    break
+                position = end
+                entity_id = state.get('entity_id', entity_id)
+                yield entity_id, state
+            elif char == '[':
+                depth += 1
+                if depth == 2:
+                    entity_id = None
+                position += 1
+            elif char == ']':
+                depth -= 1
+                position += 1
+            else:
+                position += 1
+    if buffer[position:].strip():
+        raise ApiException('Failed to parse history: response ended unexpectedly')
+
+
+class StateSnapshot:
+    def __init__(self, states:list):
+        self.fetched_at = time.monotonic()
+        self.states = {}
+        self.domains = {}
+        for state in states:
+            self.put_state(state)
+
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+
+    def put_state(self, state:dict):
+        entity_id = state['entity_id']
+        self.states[entity_id] = _add_brightness_pct(state)
+        self.domains.setdefault(entity_id.split('.')[0], {})[entity_id] = None
+
+
+    def get_state(self, entity_id:str):
+        return self.states.get(entity_id)
+
+
+    def get_domain(self, domain:str):
+        return [self.states[entity_id] for entity_id in self.domains.get(domain, {})]
+
+
+class ServiceDispatcher:
+    def __init__(self, api:"HassAPI", window:float=0.05, max_workers:int=4):
+        # calls collected within `window` seconds of the first one are sent together
+        self.api = api
+        self.window = window
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._by_entity = {}
+        self._without_entity = []
+        self._timer = None
+
+
+    def call_service(self, service:str, entity_id:str=None, service_data:dict=None):
+        # a later call for the same entity supersedes the pending one, both callers get the final result
+        future = Future()
+        service_data = service_data or {}
+        with self._lock:
+            if entity_id:
+                entity_id = _service_entity_id(service.split('.')[0], entity_id)
+                superseded = self._by_entity.pop(entity_id, None)
+                futures = (superseded['futures'] if superseded else []) + [future]
+                self._by_entity[entity_id] = {'service': service, 'service_data': service_data, 'futures': futures}
+            else:
+                self._without_entity.append({'service': service, 'service_data': service_data, 'futures': [future]})
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            by_entity, self._by_entity = self._by_entity, {}
+            without_entity, self._without_entity = self._without_entity, []
+
+        groups = {}
+        for entity_id, call in by_entity.items():
+            key = (call['service'], json.dumps(call['service_data'], sort_keys=True, default=str))
+            group = groups.setdefault(key, {'service': call['service'], 'service_data': call['service_data'], 'entities': {}})
+            group['entities'][entity_id] = call['futures']
+        for group in groups.values():
+            self._executor.submit(self.__send_group, group)
+        for call in without_entity:
+            self._executor.submit(self.__send_single, call)
+
+
+    def __send_group(self, group:dict):
+        try:
+            response = self.api.call_service(group['service'], list(group['entities']), group['service_data'])
+        except Exception as e:
+            for futures in group['entities'].values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+        for entity_id, futures in group['entities'].items():
+            result = [state for state in response if type(state) == dict and state.get('entity_id') == entity_id] if type(response) == list else response
+            for future in futures:
+                future.set_result(result)
+
+
+    def __send_single(self, call:dict):
+        try:
+            result = self.api.call_service(call['service'], service_data=call['service_data'])
+        except Exception as e:
+            for future in call['futures']:
+                future.set_exception(e)
+            return
+        for future in call['futures']:
+            future.set_result(result)
+
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
 
-ApiException.set_api_name("HassAPI")
 
 class HassAPI:
-    def __init__(self, base_url:str, access_token:str):
+    def __init__(self, base_url:str, access_token:str, transport:Transport=None, state_ttl:float=None):
+        # state_ttl: seconds get_state answers from the last /api/states snapshot, None always asks the server
         base_url = base_url.removesuffix('/api/')
         self.base_url = f'{base_url}/api'
         self.headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
         }
+        self.transport = transport or get_default_transport()
+        self.state_ttl = state_ttl
+        self._snapshot = None
+
+
+    def get_states(self, refresh:bool=False):
+        snapshot = self._snapshot
+        if snapshot is not None and not refresh and self.state_ttl is not None and snapshot.age() < self.state_ttl:
+            return snapshot
+        response = self.transport.get(f"{self.base_url}/states", headers=self.headers)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get states: {response.text}')
+        snapshot = StateSnapshot(loads(response.content))
+        if self.state_ttl is not None:
+            self._snapshot = snapshot
+        return snapshot
+
+
+    def get_domain_states(self, domain:str):
+        return self.get_states().get_domain(domain)
+
+
+    def get_state_records(self, domain:str=None, fields:tuple=None):
+        # compact HassState records decoded straight from /api/states, the state snapshot is not used
+        if fields is not None:
+            fields = tuple(dict.fromkeys(("entity_id", *fields)))
+        response = self.transport.get(f"{self.base_url}/states", headers=self.headers)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get states: {response.text}')
+        records = decode(response.content, HassState, fields)
+        if domain is not None:
+            records = [record for record in records if record.entity_id.split('.')[0] == domain]
+        if fields is None or 'attributes' in fields:
+            for record in records:
+                if record.attributes is not None:
+                    _add_brightness_pct({'entity_id': record.entity_id, 'attributes': record.attributes})
+        return records
+
+
+    def invalidate_states(self):
+        self._snapshot = None
 
 
     def get_state(self, entity_id:str):
+        if self.state_ttl is not None:
+            state = self.get_states().get_state(entity_id)
+            if state is not None:
+                return state
         url = f"{self.base_url}/states/{entity_id}"
-        response = requests.get(url, headers=self.headers)
+        response = self.transport.get(url, headers=self.headers, endpoint="/api/states/{entity_id}")
         if response.status_code >= 300:
             raise ApiException(f'Failed to get state of "{entity_id}": {response.text}')
-        response = response.json()
-        if entity_id.split('.')[0] == 'light':
-            try:
-                brightness = int(response['attributes']['brightness'])
-                brightness_pct = round(brightness / 255 * 100)
-            except:
-                brightness_pct = None
-            response['attributes']['brightness_pct'] = brightness_pct
-        return response
+        return _add_brightness_pct(loads(response.content))
     
 
     def call_service(self, service:str, entity_id:str=None, service_data:dict={}):
-        domain, service_name = service.split('.')
-        url = f"{self.base_url}/services/{domain}/{service_name}"
-        if entity_id:
-            if not entity_id.startswith(domain + '.'):
-                entity_id = f"{domain}.{entity_id.rsplit('.', 1)[-1]}"
-            service_data['entity_id'] = entity_id
-        response = requests.post(url, headers=self.headers, json=service_data)
+        url, service_data = _service_url(self.base_url, service, entity_id, service_data)
+        response = self.transport.post(url, headers=self.headers, json=service_data, endpoint="/api/services/{domain}/{service}")
         if response.status_code >= 300:
             raise ApiException(f'Failed to call service "{service}": {response.text}')
-        return response.json()
+        response = loads(response.content)
+        # the service returns the states it changed, keep the snapshot current with them
+        if self._snapshot is not None and type(response) == list:
+            for state in response:
+                if type(state) == dict and 'entity_id' in state:
+                    self._snapshot.put_state(state)
+        return response
+    
+
+    def render_template(self, template:str, variables:dict=None):
+        data = {"template": template}
+        if variables:
+            data["variables"] = variables
+        response = self.transport.post(f"{self.base_url}/template", headers=self.headers, json=data, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to render template: {response.text}')
+        return response.text
+    
+
+    def aggregate(self, function:AggregateFunction, domain:str=None, attribute:str=None, state:str=None, entity_ids:list=None, where:dict=None):
+        # computed by home assistant, only the result travels over the network
+        template = aggregate_template(function, domain, attribute, state, entity_ids, where)
+        return json.loads(self.render_template(template))
+    
+
+    def count_entities(self, domain:str=None, state:str=None, where:dict=None):
+        return self.aggregate("count", domain, state=state, where=where)
+    
+
+    def get_history(self, entity_ids:list, start:datetime, end:datetime=None, window:timedelta=timedelta(days=1), max_workers:int=4):
+        # returns {entity_id: HistoryColumns}, the range is fetched as parallel windows and parsed while streaming
+        if type(entity_ids) == str:
+            entity_ids = [entity_ids]
+        start = _as_utc(start)
+        end = _as_utc(end) if end else datetime.now(timezone.utc)
+        windows = []
+        window_start = start
+        while window_start < end:
+            windows.append((window_start, min(end, window_start + window)))
+            window_start += window
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            parts = [executor.submit(self.__get_history_window, entity_ids, window_start, window_end) for window_start, window_end in windows]
+            history = {}
+            for part in parts:
+                for entity_id, columns in part.result().items():
+                    if entity_id in history:
+                        history[entity_id].extend(columns)
+                    else:
+                        history[entity_id] = columns
+            return history
+
+
+    def __get_history_window(self, entity_ids:list, start:datetime, end:datetime):
+        params = {
+            "filter_entity_id": ",".join(entity_ids),
+            "end_time": end.isoformat(),
+            "minimal_response": "",
+            "no_attributes": ""
+        }
+        columns = {}
+        with self.transport.stream("GET", f"{self.base_url}/history/period/{start.isoformat()}", headers=self.headers, params=params, endpoint="/api/history/period/{start}") as response:
+            if response.status_code >= 300:
+                raise ApiException(f'Failed to get history: {response.text}')
+            for entity_id, state in _iter_history_states(response.iter_bytes()):
+                if entity_id not in columns:
+                    columns[entity_id] = HistoryColumns(entity_id)
+                columns[entity_id].append(_timestamp_us(state.get('last_changed') or state.get('last_updated')), state.get('state'))
+        return columns
+    
+
+    def dispatcher(self, window:float=0.05, max_workers:int=4):
+        return ServiceDispatcher(self, window, max_workers)
     
 
     def activate_script(self, script_name:str, await_response:bool=True):
@@ -67,5 +475,60 @@ class HassAPI:
 
     def fire_event(self, event_name:str, event_data:dict={}):
         url = f"{self.base_url}/events/{event_name}"
-        response = requests.post(url, headers=self.headers, json=event_data)
-        return response.json()
\ No newline at end of file
+        response = self.transport.post(url, headers=self.headers, json=event_data, endpoint="/api/events/{event_type}")
+        return loads(response.content)
+
+
+class AsyncHassAPI:
+    def __init__(self, base_url:str, access_token:str, transport:AsyncTransport=None):
+        base_url = base_url.removesuffix('/api/')
+        self.base_url = f'{base_url}/api'
+        self.headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        }
+        self.transport = transport or get_default_async_transport()
+
+
+    async def get_state(self, entity_id:str):
+        url = f"{self.base_url}/states/{entity_id}"
+        response = await self.transport.get(url, headers=self.headers, endpoint="/api/states/{entity_id}")
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get state of "{entity_id}": {response.text}')
+        return _add_brightness_pct(loads(response.content))
+
+
+    async def call_service(self, service:str, entity_id:str=None, service_data:dict={}):
+        url, service_data = _service_url(self.base_url, service, entity_id, service_data)
+        response = await self.transport.post(url, headers=self.headers, json=service_data, endpoint="/api/services/{domain}/{service}")
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to call service "{service}": {response.text}')
+        return loads(response.content)
+
+
+    async def activate_script(self, script_name:str, await_response:bool=True):
+        if not script_name.startswith('script.'):
+            script_name = f"script.{script_name}"
+        if await_response:
+            return await self.call_service(script_name)
+        else:
+            return await self.call_service("script.turn_on", entity_id=script_name)
+
+
+    async def trigger_automation(self, automation_name:str, skip_condition:bool=False):
+        return await self.call_service(f"automation.{automation_name}", "trigger", {"skip_condition": skip_condition})
+
+
+    async def activate_scene(self, scene_name:str):
+        if not scene_name.startswith('scene.'):
+            scene_name = f"scene.{scene_name}"
+        response = await self.call_service("scene.turn_on", entity_id=scene_name)
+        if response == []:
+            raise ApiException(f'Scene "{scene_name}" not found')
+        return response
+
+
+    async def fire_event(self, event_name:str, event_data:dict={}):
+        url = f"{self.base_url}/events/{event_name}"
+        response = await self.transport.post(url, headers=self.headers, json=event_data, endpoint="/api/events/{event_type}")
+        return loads(response.content)
\ No newline at end of file
@@ -0,0 +1,248 @@
+# https://developers.home-assistant.io/docs/api/websocket/
+import asyncio, inspect, json
+
+from .utils import ApiException
+from .HassAPI import _add_brightness_pct
+
+ApiException = ApiException.for_api("HassWebSocketAPI")
+
+
+class HassWebSocketAPI:
+    def __init__(self, base_url:str, access_token:str, reconnect_delay:float=1, max_reconnect_delay:float=60):
+        base_url = base_url.removesuffix('/').removesuffix('/api')
+        if base_url.startswith('https://'):
+            base_url = 'wss://' + base_url.removeprefix('https://')
+        elif base_url.startswith('http://'):
+            base_url = 'ws://' + base_url.removeprefix('http://')
+        self.url = f'{base_url}/api/websocket'
+        self.access_token = access_token
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._ws = None
+        self._message_id = 0
+        self._pending = {}
+        self._subscriptions = {}
+        self._next_subscription = 0
+        # created in connect(), before python 3.10 an Event binds to the loop that is current when it is built
+        self._connected = None
+        self._runner = None
+        self._first_connect = None
+        # why the runner gave up (authentication failed on a reconnect), raised by connect() and state_changes()
+        self._error = None
+        # running async callbacks, the loop only keeps weak references to tasks
+        self._callback_tasks = set()
+
+    ## Connection
+
+    async def connect(self):
+        if self._runner is None:
+            self._error = None
+            self._connected = asyncio.Event()
+            self._first_connect = asyncio.get_running_loop().create_future()
+            self._runner = asyncio.create_task(self.__run())
+            try:
+                await self._first_connect
+            except Exception:
+                self._runner = None
+                raise
+        runner = self._runner
+        if not self._connected.is_set():
+            # waits for the next reconnect, or until the runner gives up
+            waiter = asyncio.ensure_future(self._connected.wait())
+            try:
+                await asyncio.wait({waiter, runner}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+        if runner.done():
+            # the next connect() starts a new runner
+            if self._runner is runner:
+                self._runner = None
+            raise self._error or ConnectionError('Home Assistant websocket connection closed')
+        return self
+
+
+    async def close(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+        if self._connected is not None:
+            self._connected.clear()
+        self._error = None
+
+
+    async def __aenter__(self):
+        return await self.connect()
+
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+    async def __run(self):
+        try:
+            import websockets
+        except ImportError:
+            self._first_connect.set_exception(ApiException("The websocket client requires websockets. Install it with 'pip install websockets'."))
+            return
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with websockets.connect(self.url, max_size=None) as ws:
+                    await self.__authenticate(ws)
+                    self._ws = ws
+                    self._message_id = 0
+                    reader = asyncio.create_task(self.__read(ws))
+                    # the subscription has to be renewed on every new connection
+                    await self.__subscribe_state_changes()
+                    self._connected.set()
+                    if not self._first_connect.done():
+                        self._first_connect.set_result(None)
+                    delay = self.reconnect_delay
+                    await reader
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self._first_connect.done():
+                    self._first_connect.set_exception(e)
+                    self.__give_up(e)
+                    return
+                if isinstance(e, PermissionError):
+                    self.__give_up(e)
+                    return
+            finally:
+                self._ws = None
+                self._connected.clear()
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(self._error or ConnectionError('Home Assistant websocket connection lost'))
+                self._pending.clear()
+            await asyncio.sleep(delay)
+            delay = min(self.max_reconnect_delay, delay * 2)
+
+
+    def __give_up(self, error:Exception):
+        # no more reconnects, state_changes() consumers get the error instead of waiting forever
+        self._error = error
+        for subscription in self._subscriptions.values():
+            if subscription['queue'] is not None:
+                subscription['queue'].put_nowait(error)
+
+
+    async def __authenticate(self, ws):
+        message = json.loads(await ws.recv())
+        if message.get('type') == 'auth_required':
+            await ws.send(json.dumps({'type': 'auth', 'access_token': self.access_token}))
+            message = json.loads(await ws.recv())
+        if message.get('type') != 'auth_ok':
+            raise PermissionError(f'Home Assistant websocket authentication failed: {message.get("message", message)}')
+
+
+    async def __read(self, ws):
+        async for raw in ws:
+            message = json.loads(raw)
+            if message.get('type') == 'result':
+                future = self._pending.pop(message.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+            elif message.get('type') == 'event':
+                await self.__dispatch(message['event'])
+
+
+    async def __command(self, payload:dict):
+        if self._ws is None:
+            await self.connect()
+        self._message_id += 1
+        message_id = self._message_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        await self._ws.send(json.dumps({'id': message_id, **payload}))
+        message = await future
+        if not message.get('success'):
+            raise ApiException(f'Websocket command "{payload["type"]}" failed: {message.get("error")}')
+        return message.get('result')
+
+    ## State subscriptions
+
+    async def __subscribe_state_changes(self):
+        await self.__command({'type': 'subscribe_events', 'event_type': 'state_changed'})
+
+
+    async def __dispatch(self, event:dict):
+        data = event.get('data', {})
+        entity_id = data.get('entity_id', '')
+        if data.get('new_state'):
+            _add_brightness_pct(data['new_state'])
+        for subscription in list(self._subscriptions.values()):
+            if subscription['entity_ids'] is not None and entity_id not in subscription['entity_ids']:
+                continue
+            if subscription['domains'] is not None and entity_id.split('.')[0] not in subscription['domains']:
+                continue
+            if subscription['queue'] is not None:
+                subscription['queue'].put_nowait(data)
+                continue
+            try:
+                result = subscription['callback'](data)
+                if inspect.isawaitable(result):
+                    # async callbacks run as tasks so a slow one does not hold up the reader
+                    task = asyncio.ensure_future(result)
+                    self._callback_tasks.add(task)
+                    task.add_done_callback(self._callback_tasks.discard)
+            except Exception:
+                # a failing callback must not stop the reader
+                pass
+
+
+    def subscribe_states(self, callback=None, entity_ids:list=None, domains:list=None):
+        # callback(data) receives {'entity_id', 'old_state', 'new_state'}, it may be sync or async
+        self._next_subscription += 1
+        self._subscriptions[self._next_subscription] = {
+            'callback': callback,
+            'queue': None if callback else asyncio.Queue(),
+            'entity_ids': set(entity_ids) if entity_ids else None,
+            'domains': set(domains) if domains else None
+        }
+        return self._next_subscription
+
+
+    def unsubscribe(self, subscription_id:int):
+        self._subscriptions.pop(subscription_id, None)
+
+
+    async def state_changes(self, entity_ids:list=None, domains:list=None):
+        subscription_id = self.subscribe_states(entity_ids=entity_ids, domains=domains)
+        queue = self._subscriptions[subscription_id]['queue']
+        try:
+            if self._error is not None:
+                raise self._error
+            while True:
+                change = await queue.get()
+                if isinstance(change, Exception):
+                    raise change
+                yield change
+        finally:
+            self.unsubscribe(subscription_id)
+
+    ## Services
+
+    async def call_service(self, service:str, entity_id:str=None, service_data:dict=None):
+        domain, service_name = service.split('.')
+        payload = {'type': 'call_service', 'domain': domain, 'service': service_name, 'service_data': service_data or {}}
+        if entity_id:
+            if type(entity_id) == str and not entity_id.startswith(domain + '.'):
+                entity_id = f"{domain}.{entity_id.rsplit('.', 1)[-1]}"
+            payload['target'] = {'entity_id': entity_id}
+        try:
+            return await self.__command(payload)
+        except ConnectionError as e:
+            raise ApiException(f'Failed to call service "{service}": {e}')
+
+
+    async def get_states(self):
+        return [_add_brightness_pct(state) for state in await self.__command({'type': 'get_states'})]
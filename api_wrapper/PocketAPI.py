@@ -1,11 +1,15 @@
 #https://getpocket.com/developer/docs/
-import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import parse_qsl
 from typing import Literal
 
 from .utils import ApiException
+from .transport import Transport, AsyncTransport, get_default_transport, get_default_async_transport
+from .decoding import loads, decode
+from .models import PocketItem
 
-ApiException.set_api_name("PocketAPI")
+ApiException = ApiException.for_api("PocketAPI")
 
 ItemState = Literal["unread", "archive", "all", "all_and_deleted"]
 ItemTag = Literal["__untagged__"]
@@ -13,12 +17,202 @@ ItemContentType = Literal["article", "video", "image"]
 ItemSort = Literal["newest", "oldest", "title", "site"]
 ItemDetailType = Literal["simple", "complete"]
 
+
+def _get_items_data(state:ItemState="all",
+                    favorite:bool=None,
+                    tag:ItemTag=None,
+                    content_type:ItemContentType=None,
+                    sort:ItemSort="newest",
+                    detailType:ItemDetailType="simple",
+                    search:str=None,
+                    domain:str=None,
+                    since:int=None,
+                    count:int=30,
+                    offset:int=0):
+    if count > 30:
+        raise ApiException("The maximum number of items to retrieve is 30.")
+    data = {
+        "state": "all" if state == "all_and_deleted" else state,
+        "sort": sort,
+        "detailType": detailType,
+        "count": count,
+        "offset": offset
+    }
+    if favorite is not None:
+        favorite = "1" if favorite else "0"
+        data["favorite"] = favorite
+    if tag:
+        data["tag"] = tag
+    if content_type:
+        data["contentType"] = content_type
+    if search:
+        data["search"] = search
+    if domain:
+        data["domain"] = domain
+    if since:
+        data["since"] = since
+    return data
+
+
+def _item_value(item, name:str):
+    return item.get(name) if isinstance(item, dict) else getattr(item, name)
+
+
+def _drop_deleted_items(state:ItemState, response:dict):
+    if state == "all":
+        item_list = {}
+        for item_id, item in response["list"].items():
+            if _item_value(item, "status") == "2":
+                continue
+            item_list[item_id] = item
+        response["list"] = item_list
+    return response
+
+
+def _sorted_items(response:dict):
+    return sorted(response["list"].values(), key=lambda item: int(_item_value(item, "sort_id") or 0))
+
+
+def _record_fields(fields:tuple):
+    # status and sort_id are always kept, deleted items are filtered and pages are ordered by them
+    if fields is None:
+        return None
+    return tuple(dict.fromkeys((*fields, "status", "sort_id")))
+
+
+def _decode_items(content:bytes, typed:bool, fields:tuple):
+    if not typed and fields is None:
+        response = loads(content)
+        # pocket returns an empty list instead of an object if nothing matched
+        if not response["list"]:
+            response["list"] = {}
+        return response
+    return decode(content, PocketItem, _record_fields(fields), key="list", mapping=True, keep=("status", "complete", "since", "error"))
+
+
+def _add_item_data(url:str, title:str=None, tags:list[str]=None):
+    data = {
+        "url": url
+    }
+    if title:
+        data["title"] = title
+    if tags:
+        data["tags"] = ",".join(tags)
+    return data
+
+
+def _item_actions(item_id:int, archive:bool=None, favorite:bool=None, delete:bool=None, add_tags:list[str]=None, remove_tags:list[str]=None, set_tags:bool=None, clear_tags:bool=None):
+    actions = []
+    if archive is not None:
+        actions.append({"action": "archive" if archive else "readd", "item_id": item_id})
+    if favorite is not None:
+        actions.append({"action": "favorite" if favorite else "unfavorite", "item_id": item_id})
+    if delete:
+        actions.append({"action": "delete", "item_id": item_id})
+
+    if clear_tags:
+        actions.append({"action": "tags_clear", "item_id": item_id})
+    if remove_tags:
+        actions.append({"action": "tags_remove", "item_id": item_id, "tags": ",".join(remove_tags)})
+    if set_tags:
+        actions.append({"action": "tags_replace", "item_id": item_id, "tags": ",".join(set_tags)})
+    if add_tags:
+        actions.append({"action": "tags_add", "item_id": item_id, "tags": ",".join(add_tags)})
+    return actions
+
+class PocketBatch:
+    def __init__(self, api:"PocketAPI", chunk_size:int=100):
+        self.api = api
+        self.chunk_size = chunk_size
+        self.actions = []
+        self.results = []
+
+
+    def modify(self, item_ids:list, archive:bool=None, favorite:bool=None, delete:bool=None, add_tags:list[str]=None, remove_tags:list[str]=None, set_tags:bool=None, clear_tags:bool=None):
+        if type(item_ids) == int or type(item_ids) == str:
+            item_ids = [item_ids]
+        for item_id in item_ids:
+            self.actions.extend(_item_actions(item_id, archive, favorite, delete, add_tags, remove_tags, set_tags, clear_tags))
+        return self
+
+
+    def archive(self, item_ids:list):
+        return self.modify(item_ids, archive=True)
+
+
+    def readd(self, item_ids:list):
+        return self.modify(item_ids, archive=False)
+
+
+    def favorite(self, item_ids:list):
+        return self.modify(item_ids, favorite=True)
+
+
+    def unfavorite(self, item_ids:list):
+        return self.modify(item_ids, favorite=False)
+
+
+    def delete(self, item_ids:list):
+        return self.modify(item_ids, delete=True)
+
+
+    def add_tags(self, item_ids:list, tags:list[str]):
+        return self.modify(item_ids, add_tags=tags)
+
+
+    def remove_tags(self, item_ids:list, tags:list[str]):
+        return self.modify(item_ids, remove_tags=tags)
+
+
+    def set_tags(self, item_ids:list, tags:list[str]):
+        return self.modify(item_ids, set_tags=tags)
+
+
+    def clear_tags(self, item_ids:list):
+        return self.modify(item_ids, clear_tags=True)
+
+
+    def send(self):
+        # returns one entry per queued action, in queue order: {'item_id', 'action', 'status': 'success', 'result'}
+        # or {'item_id', 'action', 'status': 'failed', 'error'} when pocket rejected the action or its chunk failed
+        results = []
+        actions, self.actions = self.actions, []
+        for start in range(0, len(actions), self.chunk_size):
+            chunk = actions[start:start + self.chunk_size]
+            try:
+                response = self.api.send_actions(chunk)
+            except Exception as e:
+                results.extend({"item_id": action["item_id"], "action": action["action"], "status": "failed", "error": str(e)} for action in chunk)
+                continue
+            action_results = response.get("action_results") or []
+            action_errors = response.get("action_errors") or []
+            for index, action in enumerate(chunk):
+                result = action_results[index] if index < len(action_results) else None
+                if result is False or result is None:
+                    error = action_errors[index] if index < len(action_errors) else None
+                    results.append({"item_id": action["item_id"], "action": action["action"], "status": "failed", "error": error or "Rejected by Pocket"})
+                else:
+                    results.append({"item_id": action["item_id"], "action": action["action"], "status": "success", "result": result})
+        self.results = results
+        return results
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.send()
+
+
 class PocketAPI:
     class OAuth:
-        def __init__(self, consumer_key, redirect_uri):
+        def __init__(self, consumer_key, redirect_uri, transport:Transport=None):
             self.consumer_key = consumer_key
             self.redirect_uri = redirect_uri
             self.code = None
+            self.transport = transport or get_default_transport()
 
         def __request_token(self):
             url = "https://getpocket.com/v3/oauth/request"
@@ -27,7 +221,7 @@ class PocketAPI:
                 "redirect_uri": self.redirect_uri
             }
             try:
-                response = requests.post(url, json=data)
+                response = self.transport.post(url, json=data)
                 if response.status_code >= 300:
                     raise Exception(response.text)
                 response = dict(parse_qsl(response.text))
@@ -49,7 +243,7 @@ class PocketAPI:
                 "consumer_key": self.consumer_key,
                 "code": self.code
             }
-            response = requests.post(url, json=data)
+            response = self.transport.post(url, json=data)
             if response.status_code >= 300:
                 raise ApiException(f'Failed to get access token: {response.text}')
             response = dict(parse_qsl(response.text))
@@ -63,12 +257,13 @@ class PocketAPI:
 
     ## Init
 
-    def __init__(self, customer_key, access_token=None):
+    def __init__(self, customer_key, access_token=None, transport:Transport=None):
         if access_token == None:
             raise ApiException.MissingAccessToken("PocketAPI.OAuth")
         self.access_token = access_token
         self.customer_key = customer_key
         self.base_url = "https://getpocket.com/v3"
+        self.transport = transport or get_default_transport()
 
     def __append_auth(self, data):
         data["consumer_key"] = self.customer_key
@@ -87,89 +282,227 @@ class PocketAPI:
                 domain:str=None,
                 since:int=None,
                 count:int=30, 
-                offset:int=0):
-        if count > 30:
-            raise ApiException("The maximum number of items to retrieve is 30.")
-        data = {
-            "state": "all" if state == "all_and_deleted" else state,
-            "sort": sort,
-            "detailType": detailType,
-            "count": count,
-            "offset": offset
-        }
-        if favorite is not None:
-            favorite = "1" if favorite else "0"
-            data["favorite"] = favorite
-        if tag:
-            data["tag"] = tag
-        if content_type:
-            data["contentType"] = content_type
-        if search:
-            data["search"] = search
-        if domain:
-            data["domain"] = domain
-        if since:
-            data["since"] = since
+                offset:int=0,
+                typed:bool=False,
+                fields:tuple=None):
+        # typed: return PocketItem records instead of dicts, fields: record attributes to decode (implies typed)
+        data = _get_items_data(state, favorite, tag, content_type, sort, detailType, search, domain, since, count, offset)
+        return _drop_deleted_items(state, self.__fetch_items(data, typed, fields))
+
+
+    def __fetch_items(self, data, typed:bool=False, fields:tuple=None):
         data = self.__append_auth(data)
-        response = requests.post(self.base_url + "/get", json=data)
+        response = self.transport.post(self.base_url + "/get", json=data, idempotent=True)
         if response.status_code >= 300:
             raise ApiException(f"Failed to get items: {response.text}")
-        response = response.json()
-        if state == "all":
-            item_list = {}
-            for item_id, item in response["list"].items():
-                if item["status"] == "2":
-                    continue
-                item_list[item_id] = item
-            response["list"] = item_list
-        return response
+        return _decode_items(response.content, typed, fields)
+
+
+    def iter_pages(self,
+                state:ItemState="all",
+                favorite:bool=None,
+                tag:ItemTag=None,
+                content_type:ItemContentType=None,
+                sort:ItemSort="newest",
+                detailType:ItemDetailType="simple",
+                search:str=None,
+                domain:str=None,
+                since:int=None,
+                page_size:int=30,
+                prefetch:int=2,
+                typed:bool=False,
+                fields:tuple=None):
+        # pages are requested up to `prefetch` offsets ahead and yielded in order
+        pending = deque()
+        next_offset = 0
+        with ThreadPoolExecutor(max_workers=prefetch + 1) as executor:
+            def schedule():
+                nonlocal next_offset
+                data = _get_items_data(state, favorite, tag, content_type, sort, detailType, search, domain, since, page_size, next_offset)
+                pending.append(executor.submit(self.__fetch_items, data, typed, fields))
+                next_offset += page_size
+
+            try:
+                for _ in range(prefetch + 1):
+                    schedule()
+                while pending:
+                    response = pending.popleft().result()
+                    is_last = len(response["list"]) < page_size
+                    yield _drop_deleted_items(state, response)
+                    if is_last:
+                        break
+                    schedule()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+    def iter_items(self,
+                state:ItemState="all",
+                favorite:bool=None,
+                tag:ItemTag=None,
+                content_type:ItemContentType=None,
+                sort:ItemSort="newest",
+                detailType:ItemDetailType="simple",
+                search:str=None,
+                domain:str=None,
+                since:int=None,
+                page_size:int=30,
+                prefetch:int=2,
+                typed:bool=False,
+                fields:tuple=None):
+        for page in self.iter_pages(state, favorite, tag, content_type, sort, detailType, search, domain, since, page_size, prefetch, typed, fields):
+            yield from _sorted_items(page)
     
 
     def add_item(self, url:str, title:str=None, tags:list[str]=None):
-        data = {
-            "url": url
-        }
-        if title:
-            data["title"] = title
-        if tags:
-            data["tags"] = ",".join(tags)
+        data = _add_item_data(url, title, tags)
         data = self.__append_auth(data)
-        response = requests.post(self.base_url + "/add", json=data)
+        response = self.transport.post(self.base_url + "/add", json=data)
         if response.status_code >= 300:
             raise ApiException(f"Failed to add item: {response.text}")
-        return response.json()
+        return loads(response.content)
     
 
     def modify_item(self, item_id:int, archive:bool=None, favorite:bool=None, delete:bool=None, add_tags:list[str]=None, remove_tags:list[str]=None, set_tags:bool=None, clear_tags:bool=None):
         data = {
-            "actions": [],
+            "actions": _item_actions(item_id, archive, favorite, delete, add_tags, remove_tags, set_tags, clear_tags),
             "item_id": item_id
         }
-        if archive is not None:
-            action = {"action": "archive" if archive else "readd", "item_id": item_id}
-            data["actions"].append(action)
-        if favorite is not None:
-            action = {"action": "favorite" if favorite else "unfavorite", "item_id": item_id}
-            data["actions"].append(action)
-        if delete:
-            action = {"action": "delete", "item_id": item_id}
-            data["actions"].append(action)
-        
-        if clear_tags:
-            action = {"action": "tags_clear", "item_id": item_id}
-            data["actions"].append(action)
-        if remove_tags:
-            action = {"action": "tags_remove", "item_id": item_id, "tags": ",".join(remove_tags)}
-            data["actions"].append(action)
-        if set_tags:
-            action = {"action": "tags_replace", "item_id": item_id, "tags": ",".join(set_tags)}
-            data["actions"].append(action)
-        if add_tags:
-            action = {"action": "tags_add", "item_id": item_id, "tags": ",".join(add_tags)}
-            data["actions"].append(action)
+        data = self.__append_auth(data)
+        response = self.transport.post(self.base_url + "/send", json=data)
+        if response.status_code >= 300:
+            raise ApiException(f"Failed to modify item: {response.text}")
+        return loads(response.content)
+
+
+    def send_actions(self, actions:list):
+        data = self.__append_auth({"actions": actions})
+        response = self.transport.post(self.base_url + "/send", json=data)
+        if response.status_code >= 300:
+            raise ApiException(f"Failed to send actions: {response.text}")
+        return loads(response.content)
+
+
+    def batch(self, chunk_size:int=100):
+        return PocketBatch(self, chunk_size)
+
+
+class AsyncPocketAPI:
+    def __init__(self, customer_key, access_token=None, transport:AsyncTransport=None):
+        if access_token == None:
+            raise ApiException.MissingAccessToken("PocketAPI.OAuth")
+        self.access_token = access_token
+        self.customer_key = customer_key
+        self.base_url = "https://getpocket.com/v3"
+        self.transport = transport or get_default_async_transport()
+
+    def __append_auth(self, data):
+        data["consumer_key"] = self.customer_key
+        data["access_token"] = self.access_token
+        return data
+
+
+    async def get_items(self,
+                state:ItemState="all",
+                favorite:bool=None,
+                tag:ItemTag=None,
+                content_type:ItemContentType=None,
+                sort:ItemSort="newest",
+                detailType:ItemDetailType="simple",
+                search:str=None,
+                domain:str=None,
+                since:int=None,
+                count:int=30,
+                offset:int=0,
+                typed:bool=False,
+                fields:tuple=None):
+        # typed: return PocketItem records instead of dicts, fields: record attributes to decode (implies typed)
+        data = _get_items_data(state, favorite, tag, content_type, sort, detailType, search, domain, since, count, offset)
+        return _drop_deleted_items(state, await self.__fetch_items(data, typed, fields))
+
 
+    async def __fetch_items(self, data, typed:bool=False, fields:tuple=None):
+        data = self.__append_auth(data)
+        response = await self.transport.post(self.base_url + "/get", json=data, idempotent=True)
+        if response.status_code >= 300:
+            raise ApiException(f"Failed to get items: {response.text}")
+        return _decode_items(response.content, typed, fields)
+
+
+    async def iter_pages(self,
+                state:ItemState="all",
+                favorite:bool=None,
+                tag:ItemTag=None,
+                content_type:ItemContentType=None,
+                sort:ItemSort="newest",
+                detailType:ItemDetailType="simple",
+                search:str=None,
+                domain:str=None,
+                since:int=None,
+                page_size:int=30,
+                prefetch:int=2,
+                typed:bool=False,
+                fields:tuple=None):
+        import asyncio
+        pending = deque()
+        next_offset = 0
+        def schedule():
+            nonlocal next_offset
+            data = _get_items_data(state, favorite, tag, content_type, sort, detailType, search, domain, since, page_size, next_offset)
+            pending.append(asyncio.ensure_future(self.__fetch_items(data, typed, fields)))
+            next_offset += page_size
+
+        try:
+            for _ in range(prefetch + 1):
+                schedule()
+            while pending:
+                response = await pending.popleft()
+                is_last = len(response["list"]) < page_size
+                yield _drop_deleted_items(state, response)
+                if is_last:
+                    break
+                schedule()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+    async def iter_items(self,
+                state:ItemState="all",
+                favorite:bool=None,
+                tag:ItemTag=None,
+                content_type:ItemContentType=None,
+                sort:ItemSort="newest",
+                detailType:ItemDetailType="simple",
+                search:str=None,
+                domain:str=None,
+                since:int=None,
+                page_size:int=30,
+                prefetch:int=2,
+                typed:bool=False,
+                fields:tuple=None):
+        async for page in self.iter_pages(state, favorite, tag, content_type, sort, detailType, search, domain, since, page_size, prefetch, typed, fields):
+            for item in _sorted_items(page):
+                yield item
+
+
+    async def add_item(self, url:str, title:str=None, tags:list[str]=None):
+        data = _add_item_data(url, title, tags)
+        data = self.__append_auth(data)
+        response = await self.transport.post(self.base_url + "/add", json=data)
+        if response.status_code >= 300:
+            raise ApiException(f"Failed to add item: {response.text}")
+        return loads(response.content)
+
+
+    async def modify_item(self, item_id:int, archive:bool=None, favorite:bool=None, delete:bool=None, add_tags:list[str]=None, remove_tags:list[str]=None, set_tags:bool=None, clear_tags:bool=None):
+        data = {
+            "actions": _item_actions(item_id, archive, favorite, delete, add_tags, remove_tags, set_tags, clear_tags),
+            "item_id": item_id
+        }
         data = self.__append_auth(data)
-        response = requests.post(self.base_url + "/send", json=data)
+        response = await self.transport.post(self.base_url + "/send", json=data)
         if response.status_code >= 300:
             raise ApiException(f"Failed to modify item: {response.text}")
-        return response.json()
\ No newline at end of file
+        return loads(response.content)
\ No newline at end of file
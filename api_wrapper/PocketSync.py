@@ -0,0 +1,130 @@
+import json, sqlite3
+from urllib.parse import urlparse
+
+from .PocketAPI import PocketAPI, ItemState, ItemTag
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    item_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    favorite INTEGER NOT NULL,
+    domain TEXT,
+    time_updated INTEGER,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    item_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (item_id, tag)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (status);
+CREATE INDEX IF NOT EXISTS items_favorite ON items (favorite);
+CREATE INDEX IF NOT EXISTS items_domain ON items (domain);
+CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag);
+"""
+
+ItemStatus_Map = {
+    "unread": "0",
+    "archive": "1",
+    "deleted": "2"
+}
+
+
+def _item_domain(item:dict):
+    url = item.get("resolved_url") or item.get("given_url") or ""
+    return urlparse(url).netloc.lower().removeprefix("www.") or None
+
+
+class PocketSync:
+    def __init__(self, api:PocketAPI, path:str="pocket.sqlite3"):
+        self.api = api
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+
+    @property
+    def since(self):
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'since'").fetchone()
+        return int(row["value"]) if row else None
+
+
+    def sync(self, full:bool=False, prefetch:int=2):
+        # pulls everything changed since the last sync, status "2" entries are deletions
+        since = None if full else self.since
+        stats = {"added": 0, "updated": 0, "deleted": 0, "since": since}
+        server_since = None
+        with self.db:
+            if full:
+                self.db.execute("DELETE FROM items")
+                self.db.execute("DELETE FROM tags")
+            for page in self.api.iter_pages(state="all_and_deleted", detailType="complete", since=since, prefetch=prefetch):
+                if server_since is None:
+                    server_since = page.get("since")
+                for item_id, item in page["list"].items():
+                    stats[self.__apply(item_id, item)] += 1
+            if server_since is not None:
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('since', ?)", (str(server_since),))
+                stats["since"] = server_since
+        return stats
+
+
+    def __apply(self, item_id:str, item:dict):
+        exists = self.db.execute("SELECT 1 FROM items WHERE item_id = ?", (item_id,)).fetchone() is not None
+        self.db.execute("DELETE FROM tags WHERE item_id = ?", (item_id,))
+        if item.get("status") == ItemStatus_Map["deleted"]:
+            self.db.execute("DELETE FROM items WHERE item_id = ?", (item_id,))
+            return "deleted"
+        self.db.execute(
+            "INSERT OR REPLACE INTO items (item_id, status, favorite, domain, time_updated, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (item_id, item.get("status", "0"), int(item.get("favorite", 0)), _item_domain(item), int(item.get("time_updated", 0)), json.dumps(item))
+        )
+        self.db.executemany("INSERT OR IGNORE INTO tags (item_id, tag) VALUES (?, ?)", [(item_id, tag) for tag in (item.get("tags") or {})])
+        return "updated" if exists else "added"
+
+
+    def get_items(self, state:ItemState="all", favorite:bool=None, tag:ItemTag=None, domain:str=None):
+        query = "SELECT data FROM items WHERE 1"
+        params = []
+        if state in ItemStatus_Map:
+            query += " AND status = ?"
+            params.append(ItemStatus_Map[state])
+        if favorite is not None:
+            query += " AND favorite = ?"
+            params.append(1 if favorite else 0)
+        if tag == "__untagged__":
+            query += " AND item_id NOT IN (SELECT item_id FROM tags)"
+        elif tag:
+            query += " AND item_id IN (SELECT item_id FROM tags WHERE tag = ?)"
+            params.append(tag)
+        if domain:
+            query += " AND domain = ?"
+            params.append(domain.lower().removeprefix("www."))
+        query += " ORDER BY time_updated DESC"
+        return [json.loads(row["data"]) for row in self.db.execute(query, params)]
+
+
+    def get_item(self, item_id:str):
+        row = self.db.execute("SELECT data FROM items WHERE item_id = ?", (str(item_id),)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+
+    def get_tags(self):
+        return [row["tag"] for row in self.db.execute("SELECT DISTINCT tag FROM tags ORDER BY tag")]
+
+
+    def close(self):
+        self.db.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,11 +1,15 @@
 #https://developer.ticktick.com/
-import requests
+import json, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlencode
 from typing import Literal
 
 from .utils import ApiException
+from .transport import Transport, AsyncTransport, get_default_transport, get_default_async_transport
+from .decoding import loads, decode
+from .models import Task
 
-ApiException.set_api_name("TickTickAPI")
+ApiException = ApiException.for_api("TickTickAPI")
 
 
 ProjectKind = Literal['task', 'note']
@@ -33,12 +37,268 @@ ChecklistItemStatus_Map = {
 }
 
 
+def _create_project_data(name:str, color:str=None, kind:ProjectKind='task', viewMode:ProjectViewOptions='list'):
+    data = {
+        'name': name,
+        'kind': kind.upper(),
+        'viewMode': viewMode.upper()
+    }
+    if color:
+        data['color'] = color
+    return data
+
+
+def _update_project_data(name:str=None, color:str=None, kind:ProjectKind=None, viewMode:ProjectViewOptions=None):
+    data = {}
+    if name:
+        data['name'] = name
+    if color:
+        data['color'] = color
+    if kind:
+        data['kind'] = kind
+    if viewMode:
+        data['viewMode'] = viewMode
+    return data
+
+
+def _create_task_data(title:str, priority:TaskPriority="none",
+                      project_id:str=None,
+                      content:str=None,
+                      desc:str=None,
+                      isAllDay:bool=False,
+                      startDate:str=None,
+                      dueDate:str=None,
+                      timeZone:str=None,
+                      reminders:list=None,
+                      sortOrder:int=None,
+                      repeatFlag:str=None,
+                      parentId:str=None
+                    ):
+    data = {
+        'title': title,
+        'priority': TaskPriority_Map.get(priority, priority),
+    }
+    if project_id:
+        data['projectId'] = project_id
+    if content:
+        data['content'] = content
+    if desc:
+        data['desc'] = desc
+    if isAllDay:
+        data['isAllDay'] = isAllDay
+    if startDate:
+        data['startDate'] = startDate
+    if dueDate:
+        data['dueDate'] = dueDate
+    if timeZone:
+        data['timeZone'] = timeZone
+    if reminders:
+        data['reminders'] = reminders
+    if repeatFlag:
+        data['repeatFlag'] = repeatFlag
+    if sortOrder:
+        data['sortOrder'] = sortOrder
+    if parentId:
+        data['parentId'] = parentId
+    return data
+
+
+def _update_task_data(project_id:str, task_id:str,
+                      title:str=None,
+                      content:str=None,
+                      desc:str=None,
+                      isAllDay:bool=None,
+                      startDate:str=None,
+                      dueDate:str=None,
+                      timeZone:str=None,
+                      status:TaskStatus=None,
+                      reminders:list=None,
+                      repeatFlag:str=None,
+                      sortOrder:int=None,
+                      priority:TaskPriority=None,
+                      items:list=None):
+    data = {
+        'id': task_id,
+        'projectId': project_id
+    }
+    if title:
+        data['title'] = title
+    if content:
+        data['content'] = content
+    if desc:
+        data['desc'] = desc
+    if isAllDay:
+        data['isAllDay'] = isAllDay
+    if startDate:
+        data['startDate'] = startDate
+    if dueDate:
+        data['dueDate'] = dueDate
+    if timeZone:
+        data['timeZone'] = timeZone
+    if status:
+        data['status'] = TaskStatus_Map.get(status, status)
+    if reminders:
+        data['reminders'] = reminders
+    if repeatFlag:
+        data['repeatFlag'] = repeatFlag
+    if sortOrder:
+        data['sortOrder'] = sortOrder
+    if priority:
+        data['priority'] = TaskPriority_Map.get(priority, priority)
+    if items is not None:
+        data['items'] = items
+    return data
+
+
+class ProjectSnapshot:
+    def __init__(self, project:dict):
+        self.project = project
+        self.fetched_at = time.monotonic()
+        self.tasks = {}
+        self.children = {}
+        self._lock = threading.RLock()
+        for task in project.get('tasks', []):
+            self.put_task(task)
+
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+
+    def get_tasks(self):
+        with self._lock:
+            return list(self.tasks.values())
+
+
+    def get_task(self, task_id:str):
+        return self.tasks.get(task_id)
+
+
+    def get_child_tasks(self, task_id:str):
+        with self._lock:
+            return [self.tasks[child_id] for child_id in self.children.get(task_id, {})]
+
+
+    def get_descendants(self, task_id:str):
+        # breadth first, so parents always come before their children
+        with self._lock:
+            descendants = []
+            queue = [task_id]
+            while queue:
+                children = self.get_child_tasks(queue.pop(0))
+                descendants.extend(children)
+                queue.extend(child['id'] for child in children)
+            return descendants
+
+
+    def put_task(self, task:dict):
+        # the snapshot mirrors /project/{id}/data, which only lists undone tasks, completed and won't do tasks leave it
+        task_id = task.get('id')
+        if not task_id:
+            return
+        with self._lock:
+            self.remove_task(task_id)
+            if task.get('status') not in (None, TaskStatus_Map['normal']):
+                return
+            self.tasks[task_id] = task
+            parent_id = task.get('parentId')
+            if parent_id:
+                self.children.setdefault(parent_id, {})[task_id] = None
+
+
+    def update_task(self, task_id:str, **fields):
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is not None:
+                self.put_task({**task, **fields})
+
+
+    def remove_task(self, task_id:str):
+        with self._lock:
+            task = self.tasks.pop(task_id, None)
+            if task is not None and task.get('parentId'):
+                self.children.get(task['parentId'], {}).pop(task_id, None)
+
+
+def _task_version(task:dict):
+    if task.get('etag') or task.get('modifiedTime'):
+        return task.get('etag') or task.get('modifiedTime')
+    return json.dumps(task.get('items', []), sort_keys=True)
+
+
+class ChecklistEditor:
+    def __init__(self, api, project_id:str, task_id:str, task:dict):
+        self.api = api
+        self.project_id = project_id
+        self.task_id = task_id
+        self.items = [dict(item) for item in task.get('items', [])]
+        self.version = _task_version(task)
+
+
+    def add(self, title:str, status:ChecklistItemStatus="normal"):
+        self.items.append({'title': title, 'status': ChecklistItemStatus_Map.get(status, status)})
+        return self
+
+
+    def set_status(self, status:ChecklistItemStatus, item_ids:list=None):
+        for item in self.items:
+            if item_ids == None or item.get('id', None) in item_ids:
+                item['status'] = ChecklistItemStatus_Map.get(status, status)
+        return self
+
+
+    def complete(self, item_ids:list=None):
+        return self.set_status("completed", item_ids)
+
+
+    def uncomplete(self, item_ids:list=None):
+        return self.set_status("normal", item_ids)
+
+
+    def delete(self, item_ids:list=None):
+        if item_ids == None:
+            self.items = []
+        else:
+            self.items = [item for item in self.items if item.get('id', None) not in item_ids]
+        return self
+
+
+    def reorder(self, item_ids:list):
+        # listed items first in the given order, the rest keep their relative order
+        position = {item_id: index for index, item_id in enumerate(item_ids)}
+        self.items.sort(key=lambda item: position.get(item.get('id'), len(position)))
+        for index, item in enumerate(self.items):
+            item['sortOrder'] = index
+        return self
+
+
+    def commit(self, check_stale:bool=False):
+        # check_stale costs one extra get_task and refuses to overwrite edits made since the task was read
+        if check_stale:
+            current = self.api.get_task(self.project_id, self.task_id)
+            if _task_version(current) != self.version:
+                raise ApiException(f'Checklist of task "{self.task_id}" was modified since it was read')
+        task = self.api.update_task(self.project_id, self.task_id, items=self.items)
+        self.version = _task_version(task)
+        return task
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.commit()
+
+
 class TickTickAPI:
     class OAuth:
-        def __init__(self, client_id:str, client_secret:str, redirect_uri:str, scopes:list =["read", "write"]):
+        def __init__(self, client_id:str, client_secret:str, redirect_uri:str, scopes:list =["read", "write"], transport:Transport=None):
             self.client_id = client_id
             self.client_secret = client_secret
             self.redirect_uri = redirect_uri
+            self.transport = transport or get_default_transport()
             self.scopes = []
             for scope in scopes:
                 self.scopes.append(f'tasks:{scope}')
@@ -66,17 +326,18 @@ class TickTickAPI:
                 'scope': self.scopes,
                 'redirect_uri': self.redirect_uri
             }
-            response = requests.post(url, data=data)
+            response = self.transport.post(url, data=data)
             if response.status_code >= 300:
                 raise ApiException(f'Failed to get access token: {response.text}')
-            response = response.json()
+            response = loads(response.content)
             if not 'access_token' in response:
                 raise ApiException(f'Failed to get access token: {response}')
             return response['access_token']
 
     ## Init
 
-    def __init__(self, access_token:str=None):
+    def __init__(self, access_token:str=None, transport:Transport=None, cache_ttl:float=None):
+        # cache_ttl: seconds a project snapshot is reused by the task getters, None disables the cache
         if access_token == None:
             raise ApiException.MissingAccessToken('TickTickAPI.OAuth')
         self.headers = {
@@ -84,62 +345,96 @@ class TickTickAPI:
             'Content-Type': 'application/json'
         }
         self.base_url = "https://api.ticktick.com"
+        self.transport = transport or get_default_transport()
+        self.cache_ttl = cache_ttl
+        self._snapshots = {}
+        self._snapshots_lock = threading.Lock()
+
+    ## Cache
+
+    def get_project_snapshot(self, project_id:str, refresh:bool=False):
+        snapshot = self._cached_snapshot(project_id)
+        if snapshot is not None and not refresh and snapshot.age() < self.cache_ttl:
+            return snapshot
+        project = self.get_project(project_id)
+        return self._cached_snapshot(project_id) or ProjectSnapshot(project)
+
+
+    def invalidate_cache(self, project_id:str=None):
+        with self._snapshots_lock:
+            if project_id is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(project_id, None)
+
+
+    def _cached_snapshot(self, project_id:str):
+        if self.cache_ttl is None:
+            return None
+        return self._snapshots.get(project_id)
 
     ## Projects
 
     def get_projects(self):
-        response = requests.get(self.base_url + '/open/v1/project', headers=self.headers)
+        response = self.transport.get(self.base_url + '/open/v1/project', headers=self.headers)
         if response.status_code >= 300:
             raise ApiException(f'Failed to get projects: {response.text}')
-        return response.json()
+        return loads(response.content)
     
 
     def get_project(self, project_id:str):
-        response = requests.get(self.base_url + f'/open/v1/project/{project_id}/data', headers=self.headers)
+        response = self.transport.get(self.base_url + f'/open/v1/project/{project_id}/data', headers=self.headers)
         if response.status_code >= 300:
             raise ApiException(f'Failed to get project: {response.text}')
-        return response.json()
+        project = loads(response.content)
+        if self.cache_ttl is not None:
+            with self._snapshots_lock:
+                self._snapshots[project_id] = ProjectSnapshot(project)
+        return project
     
 
     def create_project(self, name:str, color:str=None, kind:ProjectKind='task', viewMode:ProjectViewOptions='list'):
-        data = {
-            'name': name,
-            'kind': kind.upper(),
-            'viewMode': viewMode.upper()
-        }
-        if color:
-            data['color'] = color
-        response = requests.post(self.base_url + '/open/v1/project', headers=self.headers, json=data)
+        data = _create_project_data(name, color, kind, viewMode)
+        response = self.transport.post(self.base_url + '/open/v1/project', headers=self.headers, json=data)
         if response.status_code >= 300:
             raise ApiException(f'Failed to create project: {response.text}')
-        return response.json()
+        return loads(response.content)
     
     def update_project(self, project_id:str, name:str=None, color:str=None, kind:ProjectKind=None, viewMode:ProjectViewOptions=None):
-        data = {}
-        if name:
-            data['name'] = name
-        if color:
-            data['color'] = color
-        if kind:
-            data['kind'] = kind
-        if viewMode:
-            data['viewMode'] = viewMode
-        response = requests.post(self.base_url + f'/open/v1/project/{project_id}', headers=self.headers, json=data)
+        data = _update_project_data(name, color, kind, viewMode)
+        response = self.transport.post(self.base_url + f'/open/v1/project/{project_id}', headers=self.headers, json=data)
         if response.status_code >= 300:
             raise ApiException(f'Failed to update project: {response.text}')
-        return response.json()
+        return loads(response.content)
     
 
     def delete_project(self, project_id:str):
-        response = requests.delete(self.base_url + f'/open/v1/project/{project_id}', headers=self.headers)
+        response = self.transport.delete(self.base_url + f'/open/v1/project/{project_id}', headers=self.headers)
         if response.status_code >= 300:
             raise ApiException(f'Failed to delete project: {response.text}')
-        return response.json()
+        return loads(response.content)
     
 
     ## Tasks
 
-    def get_tasks(self, project_id:str):
+    def get_tasks(self, project_id:str, typed:bool=False, fields:tuple=None):
+        # typed: return Task records instead of dicts, fields: record attributes to decode (implies typed)
+        typed = typed or fields is not None
+        if self.cache_ttl is not None:
+            try:
+                tasks = self.get_project_snapshot(project_id).get_tasks()
+            except Exception as e:
+                raise ApiException(f'Failed to get tasks: {e}')
+            if typed:
+                fields = Task.project(fields)
+                return [Task.from_dict(task, fields) for task in tasks]
+            return tasks
+        if typed:
+            # decoded straight from the response body, skipping the dict representation
+            response = self.transport.get(self.base_url + f'/open/v1/project/{project_id}/data', headers=self.headers)
+            if response.status_code >= 300:
+                raise ApiException(f'Failed to get tasks: {response.text}')
+            return decode(response.content, Task, fields, key="tasks")["tasks"]
         try:
             project = self.get_project(project_id)
         except Exception as e:
@@ -148,13 +443,18 @@ class TickTickAPI:
     
 
     def get_task(self, project_id:str, task_id:str):
-        response = requests.get(self.base_url + f'/open/v1/project/{project_id}/task/{task_id}', headers=self.headers)
+        response = self.transport.get(self.base_url + f'/open/v1/project/{project_id}/task/{task_id}', headers=self.headers)
         if response.status_code >= 300:
             raise ApiException(f'Failed to get task: {response.text}')
-        return response.json()
+        return loads(response.content)
     
 
     def get_child_tasks(self, project_id:str, task_id:str):
+        if self.cache_ttl is not None:
+            try:
+                return self.get_project_snapshot(project_id).get_child_tasks(task_id)
+            except Exception as e:
+                raise ApiException(f'Failed to get child tasks: {e}')
         try:
             all_tasks = self.get_tasks(project_id)
             child_tasks = []
@@ -179,36 +479,15 @@ class TickTickAPI:
                     repeatFlag:str=None,
                     parentId:str=None
                 ):
-        data = {
-            'title': title,
-            'priority': TaskPriority_Map.get(priority, priority),
-        }
-        if project_id:
-            data['projectId'] = project_id
-        if content:
-            data['content'] = content
-        if desc:
-            data['desc'] = desc
-        if isAllDay:
-            data['isAllDay'] = isAllDay
-        if startDate:
-            data['startDate'] = startDate
-        if dueDate:
-            data['dueDate'] = dueDate
-        if timeZone:
-            data['timeZone'] = timeZone
-        if reminders:
-            data['reminders'] = reminders
-        if repeatFlag:
-            data['repeatFlag'] = repeatFlag
-        if sortOrder:
-            data['sortOrder'] = sortOrder
-        if parentId:
-            data['parentId'] = parentId
-        response = requests.post(self.base_url + f'/open/v1/task', headers=self.headers, json=data)
+        data = _create_task_data(title, priority, project_id, content, desc, isAllDay, startDate, dueDate, timeZone, reminders, sortOrder, repeatFlag, parentId)
+        response = self.transport.post(self.base_url + f'/open/v1/task', headers=self.headers, json=data)
         if response.status_code >= 300:
             raise ApiException(f'Failed to create task: {response.text}')
-        return response.json()
+        task = loads(response.content)
+        snapshot = self._cached_snapshot(task.get('projectId'))
+        if snapshot is not None:
+            snapshot.put_task(task)
+        return task
     
 
     def update_task(self, project_id:str, task_id:str, 
@@ -225,115 +504,292 @@ class TickTickAPI:
                     sortOrder:int=None,
                     priority:TaskPriority=None,
                     items:list=None):
-        data = {
-            'id': task_id,
-            'projectId': project_id
-        }
-        if title:
-            data['title'] = title
-        if content:
-            data['content'] = content
-        if desc:
-            data['desc'] = desc
-        if isAllDay:
-            data['isAllDay'] = isAllDay
-        if startDate:
-            data['startDate'] = startDate
-        if dueDate:
-            data['dueDate'] = dueDate
-        if timeZone:
-            data['timeZone'] = timeZone
-        if status:
-            data['status'] = TaskStatus_Map.get(status, status)
-        if reminders:
-            data['reminders'] = reminders
-        if repeatFlag:
-            data['repeatFlag'] = repeatFlag
-        if sortOrder:
-            data['sortOrder'] = sortOrder
-        if priority:
-            data['priority'] = TaskPriority_Map.get(priority, priority)
-        if items:
-            data['items'] = items
-        response = requests.post(self.base_url + f'/open/v1/task/{task_id}', headers=self.headers, json=data)
+        data = _update_task_data(project_id, task_id, title, content, desc, isAllDay, startDate, dueDate, timeZone, status, reminders, repeatFlag, sortOrder, priority, items)
+        response = self.transport.post(self.base_url + f'/open/v1/task/{task_id}', headers=self.headers, json=data)
         if response.status_code >= 300:
             raise ApiException(f'Failed to update task: {response.text}')
-        return response.json()
+        task = loads(response.content)
+        snapshot = self._cached_snapshot(project_id)
+        if snapshot is not None:
+            snapshot.put_task(task)
+        return task
 
 
     def delete_task(self, project_id:str, task_id:str):
-        response = requests.delete(self.base_url + f'/open/v1/project/{project_id}/task/{task_id}', headers=self.headers)
+        response = self.transport.delete(self.base_url + f'/open/v1/project/{project_id}/task/{task_id}', headers=self.headers)
         if response.status_code >= 300:
             raise Exception(f'Failed to delete task: {response.text}')
-        return response.json()
+        snapshot = self._cached_snapshot(project_id)
+        if snapshot is not None:
+            snapshot.remove_task(task_id)
+        return loads(response.content)
 
 
     def complete_task(self, project_id:str, task_id:str):
-        response = requests.post(self.base_url + f'/open/v1/project/{project_id}/task/{task_id}/complete', headers=self.headers)
+        response = self.transport.post(self.base_url + f'/open/v1/project/{project_id}/task/{task_id}/complete', headers=self.headers)
         if response.status_code >= 300:
             raise ApiException(f'Failed to complete task: {response.text}')
+        snapshot = self._cached_snapshot(project_id)
+        if snapshot is not None:
+            snapshot.remove_task(task_id)
         return {'status': 'success'}
     
 
     def wont_do_task(self, project_id:str, task_id:str):
+        report = self.wont_do_subtree(project_id, task_id)
+        failed = {failed_id: result['error'] for failed_id, result in report.items() if result['status'] == 'failed'}
+        if failed:
+            raise ApiException(f'Failed to set task to wont do: {failed}')
+        return report[task_id]['result']
+
+    ## Subtrees
+
+    def _run_subtree(self, project_id:str, task_id:str, action, open_only:bool, max_workers:int):
         try:
-            child_tasks = self.get_child_tasks(project_id, task_id)
-            for child in child_tasks:
-                child_id = child.get("id", None)
-                if not child_id:
-                    continue
-                if child.get("status", None) == 0:
-                    self.update_task(project_id, child["id"], status="wont_do")
-            return self.update_task(project_id, task_id, status="wont_do")
+            snapshot = self.get_project_snapshot(project_id)
         except Exception as e:
-            raise ApiException(f'Failed to set task to wont do: {e}')
+            raise ApiException(f'Failed to get task tree: {e}')
+        descendants = snapshot.get_descendants(task_id)
+        if open_only:
+            descendants = [task for task in descendants if task.get('status') == TaskStatus_Map['normal']]
+
+        report = {}
+        def run(target_id):
+            try:
+                report[target_id] = {'status': 'success', 'result': action(project_id, target_id)}
+            except Exception as e:
+                report[target_id] = {'status': 'failed', 'error': str(e)}
+
+        if descendants:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for future in as_completed([executor.submit(run, task['id']) for task in descendants]):
+                    future.result()
+        run(task_id)
+        return report
+
+
+    def wont_do_subtree(self, project_id:str, task_id:str, max_workers:int=8):
+        return self._run_subtree(project_id, task_id, lambda project_id, target_id: self.update_task(project_id, target_id, status="wont_do"), True, max_workers)
+
+
+    def complete_subtree(self, project_id:str, task_id:str, max_workers:int=8):
+        return self._run_subtree(project_id, task_id, self.complete_task, True, max_workers)
+
+
+    def delete_subtree(self, project_id:str, task_id:str, max_workers:int=8):
+        return self._run_subtree(project_id, task_id, self.delete_task, False, max_workers)
     
 
     ## Checklist
 
-    def get_checklist_items(self, project_id:str, task_id:str):
+    def _checklist_task(self, project_id:str, task_id:str, task:dict=None):
+        if task is not None:
+            return task
+        snapshot = self._cached_snapshot(project_id)
+        if snapshot is not None and snapshot.age() < self.cache_ttl and snapshot.get_task(task_id) is not None:
+            return snapshot.get_task(task_id)
+        return self.get_task(project_id, task_id)
+
+
+    def edit_checklist(self, project_id:str, task_id:str, task:dict=None):
+        # pass a task you already hold to skip the read, edits are sent with a single update_task on commit
+        try:
+            return ChecklistEditor(self, project_id, task_id, self._checklist_task(project_id, task_id, task))
+        except Exception as e:
+            raise ApiException(f'Failed to get checklist items: {e}')
+
+
+    def get_checklist_items(self, project_id:str, task_id:str, task:dict=None):
+        try:
+            return self._checklist_task(project_id, task_id, task).get('items', [])
+        except Exception as e:
+            raise ApiException(f'Failed to get checklist items: {e}')
+
+
+    def create_checklist_item(self, project_id:str, task_id:str, title:list, task:dict=None):
+        try:
+            editor = self.edit_checklist(project_id, task_id, task)
+            for checklist_item in title:
+                editor.add(checklist_item)
+            return editor.commit()
+        except Exception as e:
+            raise ApiException(f'Failed to create checklist item: {e}')
+
+
+    def complete_checklist_items(self, project_id:str, task_id:str, item_ids:list=None, task:dict=None):
+        try:
+            return self.edit_checklist(project_id, task_id, task).complete(item_ids).commit()
+        except Exception as e:
+            raise ApiException(f'Failed to complete checklist items: {e}')
+
+
+    def delete_checklist_item(self, project_id:str, task_id:str, item_id:list=None, task:dict=None):
         try:
-            task = self.get_task(project_id, task_id)
+            return self.edit_checklist(project_id, task_id, task).delete(item_id).commit()
+        except Exception as e:
+            raise ApiException(f'Failed to delete checklist item: {e}')
+
+
+class AsyncTickTickAPI:
+    def __init__(self, access_token:str=None, transport:AsyncTransport=None):
+        if access_token == None:
+            raise ApiException.MissingAccessToken('TickTickAPI.OAuth')
+        self.headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json'
+        }
+        self.base_url = "https://api.ticktick.com"
+        self.transport = transport or get_default_async_transport()
+
+    ## Projects
+
+    async def get_projects(self):
+        response = await self.transport.get(self.base_url + '/open/v1/project', headers=self.headers)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get projects: {response.text}')
+        return loads(response.content)
+
+
+    async def get_project(self, project_id:str):
+        response = await self.transport.get(self.base_url + f'/open/v1/project/{project_id}/data', headers=self.headers)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get project: {response.text}')
+        return loads(response.content)
+
+
+    async def create_project(self, name:str, color:str=None, kind:ProjectKind='task', viewMode:ProjectViewOptions='list'):
+        data = _create_project_data(name, color, kind, viewMode)
+        response = await self.transport.post(self.base_url + '/open/v1/project', headers=self.headers, json=data)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to create project: {response.text}')
+        return loads(response.content)
+
+
+    async def update_project(self, project_id:str, name:str=None, color:str=None, kind:ProjectKind=None, viewMode:ProjectViewOptions=None):
+        data = _update_project_data(name, color, kind, viewMode)
+        response = await self.transport.post(self.base_url + f'/open/v1/project/{project_id}', headers=self.headers, json=data)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to update project: {response.text}')
+        return loads(response.content)
+
+
+    async def delete_project(self, project_id:str):
+        response = await self.transport.delete(self.base_url + f'/open/v1/project/{project_id}', headers=self.headers)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to delete project: {response.text}')
+        return loads(response.content)
+
+    ## Tasks
+
+    async def get_tasks(self, project_id:str, typed:bool=False, fields:tuple=None):
+        if typed or fields is not None:
+            response = await self.transport.get(self.base_url + f'/open/v1/project/{project_id}/data', headers=self.headers)
+            if response.status_code >= 300:
+                raise ApiException(f'Failed to get tasks: {response.text}')
+            return decode(response.content, Task, fields, key="tasks")["tasks"]
+        try:
+            project = await self.get_project(project_id)
+        except Exception as e:
+            raise ApiException(f'Failed to get tasks: {e}')
+        return project.get('tasks', [])
+
+
+    async def get_task(self, project_id:str, task_id:str):
+        response = await self.transport.get(self.base_url + f'/open/v1/project/{project_id}/task/{task_id}', headers=self.headers)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to get task: {response.text}')
+        return loads(response.content)
+
+
+    async def get_child_tasks(self, project_id:str, task_id:str):
+        try:
+            all_tasks = await self.get_tasks(project_id)
+            return [task for task in all_tasks if task.get('parentId') == task_id]
+        except Exception as e:
+            raise ApiException(f'Failed to get child tasks: {e}')
+
+
+    async def create_task(self, *args, **kwargs):
+        # same arguments as TickTickAPI.create_task
+        data = _create_task_data(*args, **kwargs)
+        response = await self.transport.post(self.base_url + f'/open/v1/task', headers=self.headers, json=data)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to create task: {response.text}')
+        return loads(response.content)
+
+
+    async def update_task(self, project_id:str, task_id:str, **kwargs):
+        # same arguments as TickTickAPI.update_task
+        data = _update_task_data(project_id, task_id, **kwargs)
+        response = await self.transport.post(self.base_url + f'/open/v1/task/{task_id}', headers=self.headers, json=data)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to update task: {response.text}')
+        return loads(response.content)
+
+
+    async def delete_task(self, project_id:str, task_id:str):
+        response = await self.transport.delete(self.base_url + f'/open/v1/project/{project_id}/task/{task_id}', headers=self.headers)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to delete task: {response.text}')
+        return loads(response.content)
+
+
+    async def complete_task(self, project_id:str, task_id:str):
+        response = await self.transport.post(self.base_url + f'/open/v1/project/{project_id}/task/{task_id}/complete', headers=self.headers)
+        if response.status_code >= 300:
+            raise ApiException(f'Failed to complete task: {response.text}')
+        return {'status': 'success'}
+
+
+    async def wont_do_task(self, project_id:str, task_id:str):
+        import asyncio
+        try:
+            child_tasks = await self.get_child_tasks(project_id, task_id)
+            await asyncio.gather(*[
+                self.update_task(project_id, child["id"], status="wont_do")
+                for child in child_tasks if child.get("id") and child.get("status") == 0
+            ])
+            return await self.update_task(project_id, task_id, status="wont_do")
+        except Exception as e:
+            raise ApiException(f'Failed to set task to wont do: {e}')
+
+    ## Checklist
+
+    async def get_checklist_items(self, project_id:str, task_id:str):
+        try:
+            task = await self.get_task(project_id, task_id)
             return task.get('items', [])
         except Exception as e:
             raise ApiException(f'Failed to get checklist items: {e}')
 
 
-    def create_checklist_item(self, project_id:str, task_id:str, title:list):
+    async def create_checklist_item(self, project_id:str, task_id:str, title:list):
         try:
-            items = self.get_checklist_items(project_id, task_id)
+            items = await self.get_checklist_items(project_id, task_id)
             for checklist_item in title:
                 items.append({'title': checklist_item})
-            return self.update_task(project_id, task_id, items=items)
+            return await self.update_task(project_id, task_id, items=items)
         except Exception as e:
             raise ApiException(f'Failed to create checklist item: {e}')
 
 
-    def complete_checklist_items(self, project_id:str, task_id:str, item_ids:list=None):
+    async def complete_checklist_items(self, project_id:str, task_id:str, item_ids:list=None):
         try:
-            items = self.get_checklist_items(project_id, task_id)
-            if item_ids == None:
-                for item in items:
+            items = await self.get_checklist_items(project_id, task_id)
+            for item in items:
+                if item_ids == None or item.get('id', None) in item_ids:
                     item['status'] = ChecklistItemStatus_Map.get("completed")
-            else:
-                for item in items:
-                    item_id = item.get('id', None)
-                    if item_id in item_ids:
-                        item['status'] = ChecklistItemStatus_Map.get("completed")
-            return self.update_task(project_id, task_id, items=items)
+            return await self.update_task(project_id, task_id, items=items)
         except Exception as e:
             raise ApiException(f'Failed to complete checklist items: {e}')
 
 
-    def delete_checklist_item(self, project_id:str, task_id:str, item_id:list=None):
+    async def delete_checklist_item(self, project_id:str, task_id:str, item_id:list=None):
         try:
-            items = self.get_checklist_items(project_id, task_id)
+            items = await self.get_checklist_items(project_id, task_id)
             if item_id == None:
-                return self.update_task(project_id, task_id, items=[])
-            for item in items:
-                item_id = item.get('id', None)
-                if item['id'] != item_id and item_id != None:
-                    items.append(item)
-            return self.update_task(project_id, task_id, items=items)
+                return await self.update_task(project_id, task_id, items=[])
+            items = [item for item in items if item.get('id', None) not in item_id]
+            return await self.update_task(project_id, task_id, items=items)
         except Exception as e:
             raise ApiException(f'Failed to delete checklist item: {e}')
\ No newline at end of file
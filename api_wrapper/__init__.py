@@ -1,7 +1,47 @@
-from .HassAPI import HassAPI
-from .GroqAPI import GroqAPI
-from .FreshRssAPI import FreshRssAPI
-from .TickTickAPI import TickTickAPI
-from .PocketAPI import PocketAPI
+# submodules load on first attribute access (PEP 562), so `from api_wrapper import HassAPI` only imports what HassAPI needs
+import importlib, sys, types
 
-__all__ = ["HassAPI", "GroqAPI", "FreshRssAPI", "TickTickAPI", "PocketAPI"]
\ No newline at end of file
+_exports = {
+    "HassAPI": "HassAPI", "AsyncHassAPI": "HassAPI",
+    "HassWebSocketAPI": "HassWebSocketAPI",
+    "GroqAPI": "GroqAPI", "AsyncGroqAPI": "GroqAPI",
+    "FreshRssAPI": "FreshRssAPI", "AsyncFreshRssAPI": "FreshRssAPI",
+    "TickTickAPI": "TickTickAPI", "AsyncTickTickAPI": "TickTickAPI",
+    "PocketAPI": "PocketAPI", "AsyncPocketAPI": "PocketAPI",
+    "PocketSync": "PocketSync",
+    "Transport": "transport", "AsyncTransport": "transport",
+    "get_default_transport": "transport", "set_default_transport": "transport",
+    "get_default_async_transport": "transport", "set_default_async_transport": "transport",
+    "RetryPolicy": "resilience", "CircuitBreaker": "resilience", "CircuitOpenError": "resilience",
+    "DeadlineExceeded": "resilience", "deadline": "resilience",
+    "Hooks": "instrumentation", "RequestInfo": "instrumentation", "MetricsCollector": "instrumentation", "OpenTelemetryHooks": "instrumentation",
+    "get_decoder": "decoding", "set_decoder": "decoding",
+    "Task": "models", "ChecklistItem": "models", "PocketItem": "models", "FeverItem": "models", "FeverFeed": "models", "HassState": "models"
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    module = _exports.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_exports})
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # the import system binds loaded submodules on the package, which would hide
+        # the classes of the same name (HassAPI, PocketSync, ...) behind their modules
+        if name in _exports and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
@@ -0,0 +1,121 @@
+import json
+
+from .utils import ApiException
+
+
+_decoder = None
+_loads = None
+
+
+def _load_backend(name:str):
+    if name == "orjson":
+        import orjson
+        return orjson.loads
+    if name == "msgspec":
+        import msgspec
+        return msgspec.json.Decoder().decode
+    if name == "json":
+        return json.loads
+    raise ApiException(f'Unknown JSON decoder "{name}", use "auto", "orjson", "msgspec" or "json"')
+
+
+def set_decoder(name:str="auto"):
+    # "auto" prefers orjson, then msgspec, and falls back to the standard library
+    global _decoder, _loads
+    if name == "auto":
+        for candidate in ("orjson", "msgspec", "json"):
+            try:
+                _loads = _load_backend(candidate)
+            except ImportError:
+                continue
+            _decoder = candidate
+            return _decoder
+    try:
+        _loads = _load_backend(name)
+    except ImportError:
+        raise ApiException(f'The "{name}" decoder is not installed. Install it with \'pip install {name}\'.')
+    _decoder = name
+    return _decoder
+
+
+def get_decoder():
+    if _decoder is None:
+        set_decoder()
+    return _decoder
+
+
+def loads(content):
+    if _loads is None:
+        set_decoder()
+    return _loads(content)
+
+
+_struct_types = {}
+_msgspec = None
+
+
+def _typed_backend():
+    # typed decoding goes through msgspec whenever it is installed, whatever backend `loads` uses,
+    # so projected-out fields are never built (orjson would still materialize every dict)
+    global _msgspec
+    if _msgspec is None:
+        try:
+            import msgspec
+            _msgspec = msgspec
+        except ImportError:
+            _msgspec = False
+    return _msgspec
+
+
+def _struct_type(model, fields:tuple):
+    # msgspec skips keys that are not declared on the struct, so projected-out fields are never built
+    key = (model, fields)
+    if key not in _struct_types:
+        import msgspec
+        from typing import Any
+        declared = []
+        for name in fields:
+            nested = model._nested.get(name)
+            declared.append((name, list[_struct_type(nested, nested.__slots__)] if nested else Any, None))
+        _struct_types[key] = msgspec.defstruct(f"{model.__name__}Struct", declared)
+    return _struct_types[key]
+
+
+def _envelope_type(model, fields:tuple, key:str, mapping:bool, keep:tuple):
+    cache_key = (model, fields, key, mapping, keep)
+    if cache_key not in _struct_types:
+        import msgspec
+        from typing import Any, Union
+        record = _struct_type(model, fields)
+        # pocket sends an empty list instead of an empty object
+        records = Union[dict[str, record], list] if mapping else list[record]
+        if key is not None:
+            records = msgspec.defstruct(f"{model.__name__}Envelope", [(key, records, None), *((name, Any, None) for name in keep)])
+        _struct_types[cache_key] = records
+    return _struct_types[cache_key]
+
+
+def decode(content, model, fields:tuple=None, key:str=None, mapping:bool=False, keep:tuple=()):
+    # decodes a response body straight into `model` records
+    # key: envelope field holding the records (None if the body is the list itself), mapping: records are keyed by id,
+    # keep: other envelope fields returned next to the records
+    fields = model.project(fields)
+    msgspec = _typed_backend()
+    if msgspec:
+        envelope_type = _envelope_type(model, fields, key, mapping, tuple(keep))
+        envelope = msgspec.json.decode(content, type=envelope_type)
+        convert = model._from_struct
+        records = envelope if key is None else getattr(envelope, key)
+        extra = {} if key is None else {name: getattr(envelope, name) for name in keep}
+    else:
+        envelope = loads(content)
+        convert = model.from_dict
+        records = envelope if key is None else envelope.get(key)
+        extra = {} if key is None else {name: envelope.get(name) for name in keep}
+    if mapping:
+        records = {record_id: convert(record, fields) for record_id, record in (records or {}).items()}
+    else:
+        records = [convert(record, fields) for record in records or []]
+    if key is None:
+        return records
+    return {key: records, **extra}
@@ -0,0 +1,207 @@
+import bisect, re, threading
+from urllib.parse import urlparse
+
+
+def endpoint_template(url:str):
+    # replaces id-like path segments with {id} and drops query values, so calls group per endpoint
+    parsed = urlparse(url)
+    segments = ['{id}' if _is_id(segment) else segment for segment in parsed.path.split('/')]
+    template = '/'.join(segments)
+    if parsed.query:
+        template += '?' + '&'.join(part.split('=', 1)[0] for part in parsed.query.split('&'))
+    return template
+
+
+def _is_id(segment:str):
+    return segment.isdigit() or (len(segment) >= 8 and re.search(r'\d', segment) is not None)
+
+
+class RequestInfo:
+    __slots__ = ('method', 'url', 'endpoint', 'status', 'duration', 'request_bytes', 'response_bytes', 'retries', 'error', 'context')
+
+    def __init__(self, method:str, url:str, endpoint:str):
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint
+        self.status = None
+        self.duration = None
+        self.request_bytes = None
+        self.response_bytes = None
+        self.retries = 0
+        self.error = None
+        # free for hooks to keep per-request state between before_request and after_request
+        self.context = {}
+
+
+    def __repr__(self):
+        return f'<RequestInfo {self.method} {self.endpoint} status={self.status} duration={self.duration}>'
+
+
+class Hooks:
+    # subclass and override either method, both run in the calling thread
+    def before_request(self, info:RequestInfo):
+        pass
+
+
+    def after_request(self, info:RequestInfo):
+        pass
+
+
+def _run_hooks(hooks:list, name:str, info:RequestInfo):
+    for hook in hooks:
+        try:
+            getattr(hook, name)(info)
+        except Exception:
+            # a failing hook must not fail the request
+            pass
+
+
+def _request_bytes(response):
+    request = getattr(response, 'request', None)
+    if request is None:
+        return None
+    body = getattr(request, 'body', None)
+    if body is None and hasattr(request, 'content'):
+        try:
+            body = request.content
+        except Exception:
+            return None
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    return len(body) if isinstance(body, (bytes, bytearray)) else 0
+
+
+def _response_bytes(response, streamed:bool):
+    if not streamed:
+        return len(response.content)
+    length = response.headers.get('content-length')
+    return int(length) if length and length.isdigit() else None
+
+
+# upper bounds in seconds, the last bucket catches everything slower
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _EndpointStats:
+    __slots__ = ('count', 'errors', 'statuses', 'buckets', 'total', 'min', 'max', 'request_bytes', 'response_bytes', 'retries')
+
+    def __init__(self, bucket_count:int):
+        self.count = 0
+        self.errors = 0
+        self.statuses = {}
+        self.buckets = [0] * bucket_count
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.retries = 0
+
+
+class MetricsCollector(Hooks):
+    def __init__(self, buckets:tuple=LATENCY_BUCKETS, percentiles:tuple=(50, 90, 99)):
+        self.bounds = tuple(sorted(buckets))
+        self.percentiles = percentiles
+        self._stats = {}
+        self._lock = threading.Lock()
+
+
+    def after_request(self, info:RequestInfo):
+        key = f'{info.method} {info.endpoint}'
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _EndpointStats(len(self.bounds) + 1)
+            stats.count += 1
+            stats.buckets[bisect.bisect_left(self.bounds, info.duration)] += 1
+            stats.total += info.duration
+            stats.min = info.duration if stats.min is None else min(stats.min, info.duration)
+            stats.max = info.duration if stats.max is None else max(stats.max, info.duration)
+            stats.retries += info.retries
+            stats.request_bytes += info.request_bytes or 0
+            stats.response_bytes += info.response_bytes or 0
+            if info.error is not None or (info.status or 0) >= 400:
+                stats.errors += 1
+            status = info.status if info.status is not None else type(info.error).__name__
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+
+    def percentile(self, stats:_EndpointStats, percentile:float):
+        # interpolates linearly inside the bucket that holds the requested rank
+        rank = percentile / 100 * stats.count
+        seen = 0
+        for index, count in enumerate(stats.buckets):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else stats.max
+                lower, upper = max(lower, stats.min), min(upper, stats.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return stats.max
+
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for key, stats in self._stats.items():
+                result[key] = {
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'statuses': dict(stats.statuses),
+                    'retries': stats.retries,
+                    'mean': stats.total / stats.count,
+                    'min': stats.min,
+                    'max': stats.max,
+                    **{f'p{percentile}': self.percentile(stats, percentile) for percentile in self.percentiles},
+                    'request_bytes': stats.request_bytes,
+                    'response_bytes': stats.response_bytes,
+                    'histogram': dict(zip([*self.bounds, float('inf')], stats.buckets))
+                }
+            return result
+
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class OpenTelemetryHooks(Hooks):
+    def __init__(self, tracer=None):
+        # the tracer defaults to the globally configured provider, requires opentelemetry-api
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            from .utils import ApiException
+            raise ApiException("OpenTelemetry spans require opentelemetry-api. Install it with 'pip install opentelemetry-api'.")
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer("api_wrapper")
+
+
+    def before_request(self, info:RequestInfo):
+        info.context['span'] = self.tracer.start_span(
+            f'{info.method} {info.endpoint}',
+            kind=self._trace.SpanKind.CLIENT,
+            attributes={'http.request.method': info.method, 'url.full': info.url, 'url.template': info.endpoint, 'server.address': urlparse(info.url).hostname or ''}
+        )
+
+
+    def after_request(self, info:RequestInfo):
+        span = info.context.pop('span', None)
+        if span is None:
+            return
+        if info.status is not None:
+            span.set_attribute('http.response.status_code', info.status)
+        if info.retries:
+            span.set_attribute('http.request.resend_count', info.retries)
+        if info.request_bytes is not None:
+            span.set_attribute('http.request.body.size', info.request_bytes)
+        if info.response_bytes is not None:
+            span.set_attribute('http.response.body.size', info.response_bytes)
+        if info.error is not None:
+            span.record_exception(info.error)
+            span.set_attribute('error.type', type(info.error).__name__)
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(info.error)))
+        elif info.status is not None and info.status >= 400:
+            span.set_attribute('error.type', str(info.status))
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+        span.end()
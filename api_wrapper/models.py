@@ -0,0 +1,102 @@
+# compact records for large payloads, attribute names follow the API fields
+# with a field projection only the listed attributes are set, reading any other one raises AttributeError
+from .utils import ApiException
+
+
+class Record:
+    __slots__ = ()
+    # fields holding a list of nested records
+    _nested = {}
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+
+    @classmethod
+    def project(cls, fields:tuple=None):
+        if fields is None:
+            return cls.__slots__
+        fields = tuple(fields)
+        unknown = [name for name in fields if name not in cls.__slots__]
+        if unknown:
+            raise ApiException(f'Unknown {cls.__name__} fields: {", ".join(unknown)}')
+        return fields
+
+
+    @classmethod
+    def from_dict(cls, data:dict, fields:tuple=None):
+        record = cls.__new__(cls)
+        for name in fields or cls.__slots__:
+            value = data.get(name)
+            nested = cls._nested.get(name)
+            if nested is not None and value is not None:
+                value = [nested.from_dict(item) for item in value]
+            setattr(record, name, value)
+        return record
+
+
+    @classmethod
+    def _from_struct(cls, struct, fields:tuple=None):
+        record = cls.__new__(cls)
+        for name in fields or cls.__slots__:
+            value = getattr(struct, name)
+            nested = cls._nested.get(name)
+            if nested is not None and value is not None:
+                value = [nested._from_struct(item) for item in value]
+            setattr(record, name, value)
+        return record
+
+
+    def fields(self):
+        return [name for name in self.__slots__ if hasattr(self, name)]
+
+
+    def to_dict(self):
+        data = {}
+        for name in self.fields():
+            value = getattr(self, name)
+            if name in self._nested and value is not None:
+                value = [item.to_dict() for item in value]
+            data[name] = value
+        return data
+
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.fields()[:4])
+        return f"{type(self).__name__}({values})"
+
+
+class ChecklistItem(Record):
+    __slots__ = ("id", "title", "status", "completedTime", "isAllDay", "sortOrder", "startDate", "timeZone")
+
+
+class Task(Record):
+    __slots__ = ("id", "projectId", "title", "content", "desc", "isAllDay", "startDate", "dueDate", "timeZone",
+                 "reminders", "repeatFlag", "priority", "status", "completedTime", "sortOrder", "items",
+                 "parentId", "childIds", "tags", "kind", "etag")
+    _nested = {"items": ChecklistItem}
+
+
+class PocketItem(Record):
+    __slots__ = ("item_id", "resolved_id", "given_url", "given_title", "favorite", "status", "time_added", "time_updated",
+                 "time_read", "time_favorited", "sort_id", "resolved_title", "resolved_url", "excerpt", "is_article",
+                 "is_index", "has_video", "has_image", "word_count", "lang", "time_to_read", "top_image_url",
+                 "listen_duration_estimate", "tags", "authors", "images", "videos", "domain_metadata")
+
+
+class FeverItem(Record):
+    __slots__ = ("id", "feed_id", "title", "author", "html", "url", "is_saved", "is_read", "created_on_time")
+
+
+class FeverFeed(Record):
+    # group_id is filled in by FeedGraph from feeds_groups
+    __slots__ = ("id", "favicon_id", "title", "url", "site_url", "is_spark", "last_updated_on_time", "group_id")
+
+
+class HassState(Record):
+    __slots__ = ("entity_id", "state", "attributes", "last_changed", "last_reported", "last_updated", "context")
@@ -0,0 +1,142 @@
+import contextvars, random, threading, time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class RetryPolicy:
+    def __init__(self, max_retries:int=3, backoff_factor:float=0.5, max_backoff:float=30,
+                 retry_statuses:tuple=(429, 500, 502, 503, 504),
+                 idempotent_methods:tuple=("GET", "HEAD", "OPTIONS", "PUT", "DELETE"),
+                 respect_retry_after:bool=True):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = set(retry_statuses)
+        self.idempotent_methods = {method.upper() for method in idempotent_methods}
+        self.respect_retry_after = respect_retry_after
+
+
+    def is_idempotent(self, method:str, idempotent:bool=None):
+        if idempotent is not None:
+            return idempotent
+        return method.upper() in self.idempotent_methods
+
+
+    def should_retry(self, method:str, status_code:int, attempt:int, idempotent:bool=None):
+        # a 429 means the request was not processed, so it is safe to repeat for every method
+        if attempt >= self.max_retries or status_code not in self.retry_statuses:
+            return False
+        return status_code == 429 or self.is_idempotent(method, idempotent)
+
+
+    def should_retry_error(self, method:str, attempt:int, idempotent:bool=None):
+        return attempt < self.max_retries and self.is_idempotent(method, idempotent)
+
+
+    def backoff(self, attempt:int, retry_after:str=None):
+        if self.respect_retry_after and retry_after:
+            seconds = parse_retry_after(retry_after)
+            if seconds is not None:
+                return min(self.max_backoff, seconds)
+        # full jitter keeps many clients from retrying in lockstep
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+
+def parse_retry_after(value:str):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold:int=5, recovery_timeout:float=30):
+        # opens per host after `failure_threshold` consecutive failures, one probe is let through after `recovery_timeout`
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+
+    def before_request(self, host:str):
+        # returns True when this request is the half-open probe, which has to be resolved by
+        # record_success, record_failure or release_probe
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state['opened_at'] is None:
+                return False
+            if time.monotonic() - state['opened_at'] < self.recovery_timeout or state['probing']:
+                raise CircuitOpenError(f'Circuit for "{host}" is open after {state["failures"]} consecutive failures')
+            state['probing'] = True
+            return True
+
+
+    def release_probe(self, host:str):
+        # the probe ended without telling anything about the host (cancelled, redirect loop, ...), the next request probes again
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is not None:
+                state['probing'] = False
+
+
+    def record_success(self, host:str):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+
+    def record_failure(self, host:str):
+        with self._lock:
+            state = self._hosts.setdefault(host, {'failures': 0, 'opened_at': None, 'probing': False})
+            state['failures'] += 1
+            if state['probing'] or state['failures'] >= self.failure_threshold:
+                state['opened_at'] = time.monotonic()
+            state['probing'] = False
+
+
+    def state(self, host:str):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state['opened_at'] is None:
+                return "closed"
+            if time.monotonic() - state['opened_at'] >= self.recovery_timeout:
+                return "half_open"
+            return "open"
+
+
+_deadline = contextvars.ContextVar("api_wrapper_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds:float):
+    # every request made inside the block (including retries) has to finish within `seconds`
+    expires_at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires_at if current is None else min(current, expires_at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline(seconds:float=None):
+    expires_at = _deadline.get()
+    if seconds is not None:
+        own = time.monotonic() + seconds
+        expires_at = own if expires_at is None else min(expires_at, own)
+    return expires_at
@@ -0,0 +1,451 @@
+# requests, httpx and asyncio are imported on first use, importing a client stays cheap
+import threading, time
+from urllib.parse import urlparse
+
+from .utils import ApiException
+from .resilience import RetryPolicy, CircuitBreaker, DeadlineExceeded, current_deadline
+from .instrumentation import RequestInfo, endpoint_template, _run_hooks, _request_bytes, _response_bytes
+
+
+def _resilience(retry, circuit_breaker):
+    # None selects the default policy, False disables it
+    retry = RetryPolicy() if retry is None else retry or None
+    circuit_breaker = CircuitBreaker() if circuit_breaker is None else circuit_breaker or None
+    return retry, circuit_breaker
+
+
+def _attempt_timeout(timeout, expires_at, url:str):
+    if expires_at is None:
+        return timeout
+    remaining = expires_at - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded(f'Deadline exceeded before request to "{url}"')
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def _fits_deadline(expires_at, delay:float):
+    return expires_at is None or time.monotonic() + delay < expires_at
+
+
+def _circuit_closed(circuit_breaker, host:str):
+    # once the breaker opens the last response is returned instead of retrying into it
+    return circuit_breaker is None or circuit_breaker.state(host) == "closed"
+
+
+def _one_shot(body):
+    return hasattr(body, "read") or hasattr(body, "__next__")
+
+
+def _replayable(kwargs:dict):
+    # file objects and generators are drained by the first attempt, a retry would send an empty body
+    files = kwargs.get("files") or {}
+    files = files.values() if isinstance(files, dict) else [file for _, file in files]
+    bodies = [kwargs.get("data"), kwargs.get("content"), *(file[1] if isinstance(file, tuple) else file for file in files)]
+    return not any(_one_shot(body) for body in bodies)
+
+
+def _start_info(hooks:list, method:str, url:str, endpoint:str):
+    if not hooks:
+        return None
+    info = RequestInfo(method, url, endpoint or endpoint_template(url))
+    _run_hooks(hooks, "before_request", info)
+    info.duration = time.perf_counter()
+    return info
+
+
+def _finish_info(hooks:list, info:RequestInfo, response, attempt:int, streamed:bool):
+    info.duration = time.perf_counter() - info.duration
+    info.retries = attempt
+    if info.error is None and response is not None:
+        raw = response.response if streamed else response
+        info.status = response.status_code
+        info.request_bytes = _request_bytes(raw)
+        info.response_bytes = _response_bytes(raw, streamed)
+    _run_hooks(hooks, "after_request", info)
+
+
+class StreamedResponse:
+    # uniform streaming interface over requests and httpx responses
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+
+    @property
+    def text(self):
+        if hasattr(self.response, "iter_content"):
+            return self.response.text
+        self.response.read()
+        return self.response.text
+
+
+    def iter_bytes(self, chunk_size:int=65536):
+        if hasattr(self.response, "iter_content"):
+            return self.response.iter_content(chunk_size=chunk_size)
+        return self.response.iter_bytes(chunk_size=chunk_size)
+
+
+    def iter_lines(self):
+        if hasattr(self.response, "iter_content"):
+            for line in self.response.iter_lines():
+                yield line.decode("utf-8") if isinstance(line, bytes) else line
+        else:
+            yield from self.response.iter_lines()
+
+
+    def close(self):
+        self.response.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class AsyncStreamedResponse:
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+
+    async def read_text(self):
+        await self.response.aread()
+        return self.response.text
+
+
+    def iter_bytes(self, chunk_size:int=65536):
+        return self.response.aiter_bytes(chunk_size=chunk_size)
+
+
+    def iter_lines(self):
+        return self.response.aiter_lines()
+
+
+    async def aclose(self):
+        await self.response.aclose()
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+
+class Transport:
+    def __init__(self, pool_connections:int=10, pool_maxsize:int=10, timeout:float=30, http2:bool=False, retry:RetryPolicy=None, circuit_breaker:CircuitBreaker=None, hooks:list=None):
+        # pool_connections: number of hosts kept in the pool, pool_maxsize: keep-alive connections per host
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.http2 = http2
+        self.retry, self.circuit_breaker = _resilience(retry, circuit_breaker)
+        # objects with before_request(info) / after_request(info), see instrumentation.Hooks
+        self.hooks = list(hooks or [])
+        self._client = None
+        self._lock = threading.Lock()
+
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+
+    def _create_client(self):
+        if self.http2:
+            try:
+                import httpx
+            except ImportError:
+                raise ApiException("HTTP/2 support requires httpx. Install it with 'pip install httpx[http2]'.")
+            limits = httpx.Limits(max_connections=self.pool_connections * self.pool_maxsize, max_keepalive_connections=self.pool_maxsize)
+            return httpx.Client(http2=True, limits=limits, timeout=self.timeout)
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+
+    def _transport_errors(self):
+        if self.http2:
+            import httpx
+            return (httpx.TransportError, ConnectionError, TimeoutError)
+        import requests
+        return (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ConnectionError, TimeoutError)
+
+
+    def _send(self, method:str, url:str, send, deadline:float, idempotent:bool, endpoint:str, retry, streamed:bool, kwargs:dict):
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlparse(url).netloc
+        expires_at = current_deadline(deadline)
+        retry = self.retry if retry is None else retry or None
+        if not _replayable(kwargs):
+            retry = None
+        info = _start_info(self.hooks, method, url, endpoint)
+        attempt = 0
+        response = None
+        try:
+            while True:
+                timeout = _attempt_timeout(kwargs["timeout"], expires_at, url)
+                probe = self.circuit_breaker.before_request(host) if self.circuit_breaker else False
+                try:
+                    response = send(**{**kwargs, "timeout": timeout})
+                except self._transport_errors() as e:
+                    if self.circuit_breaker:
+                        self.circuit_breaker.record_failure(host)
+                    if retry and retry.should_retry_error(method, attempt, idempotent) and _circuit_closed(self.circuit_breaker, host):
+                        delay = retry.backoff(attempt)
+                        if _fits_deadline(expires_at, delay):
+                            time.sleep(delay)
+                            attempt += 1
+                            continue
+                    if expires_at is not None and time.monotonic() >= expires_at:
+                        raise DeadlineExceeded(f'Deadline exceeded for request to "{url}"') from e
+                    raise
+                except BaseException:
+                    # any other error (or a cancellation) must not leave the probe pending, it would keep the circuit open for good
+                    if probe:
+                        self.circuit_breaker.release_probe(host)
+                    raise
+                if self.circuit_breaker:
+                    if response.status_code >= 500:
+                        self.circuit_breaker.record_failure(host)
+                    else:
+                        self.circuit_breaker.record_success(host)
+                if retry and retry.should_retry(method, response.status_code, attempt, idempotent) and _circuit_closed(self.circuit_breaker, host):
+                    delay = retry.backoff(attempt, response.headers.get("retry-after"))
+                    if _fits_deadline(expires_at, delay):
+                        response.close()
+                        time.sleep(delay)
+                        attempt += 1
+                        continue
+                response.retries = attempt
+                return response
+        except Exception as e:
+            if info is not None:
+                info.error = e
+            raise
+        finally:
+            if info is not None:
+                _finish_info(self.hooks, info, response, attempt, streamed)
+
+
+    def request(self, method:str, url:str, deadline:float=None, idempotent:bool=None, endpoint:str=None, retry:RetryPolicy=None, **kwargs):
+        # requests.Session and httpx.Client are safe to share between threads for plain requests,
+        # the underlying connection pools are locked per host
+        # deadline: seconds for the whole call including retries, idempotent: overrides the method based retry decision,
+        # endpoint: path template reported to the hooks, derived from the url when omitted,
+        # retry: policy for this call only, False disables retries (e.g. when the caller handles 429 itself)
+        return self._send(method, url, lambda **options: self.client.request(method, url, **options), deadline, idempotent, endpoint, retry, False, kwargs)
+
+
+    def stream(self, method:str, url:str, deadline:float=None, idempotent:bool=None, endpoint:str=None, retry:RetryPolicy=None, **kwargs):
+        # the body is read lazily, close the returned response (or use it with `with`) to free the connection
+        def send(**options):
+            if self.http2:
+                request = self.client.build_request(method, url, **options)
+                return StreamedResponse(self.client.send(request, stream=True))
+            return StreamedResponse(self.client.request(method, url, stream=True, **options))
+        return self._send(method, url, send, deadline, idempotent, endpoint, retry, True, kwargs)
+
+
+    def get(self, url:str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+
+    def post(self, url:str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+    def delete(self, url:str, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport():
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = Transport()
+    return _default_transport
+
+
+def set_default_transport(transport:Transport):
+    global _default_transport
+    with _default_transport_lock:
+        _default_transport = transport
+
+
+class AsyncTransport:
+    def __init__(self, max_connections:int=100, max_keepalive_connections:int=20, timeout:float=30, http2:bool=False, retry:RetryPolicy=None, circuit_breaker:CircuitBreaker=None, hooks:list=None):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.timeout = timeout
+        self.http2 = http2
+        self.retry, self.circuit_breaker = _resilience(retry, circuit_breaker)
+        # objects with before_request(info) / after_request(info), see instrumentation.Hooks
+        self.hooks = list(hooks or [])
+        # one client per event loop, pooled connections belong to the loop that opened them
+        # (a second asyncio.run() gets a fresh pool, clients of closed loops are dropped)
+        self._clients = {}
+
+
+    @property
+    def client(self):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            for closed in [other for other in self._clients if other.is_closed()]:
+                del self._clients[closed]
+            try:
+                import httpx
+            except ImportError:
+                raise ApiException("The async clients require httpx. Install it with 'pip install httpx'.")
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive_connections)
+            client = self._clients[loop] = httpx.AsyncClient(http2=self.http2, limits=limits, timeout=self.timeout)
+        return client
+
+
+    async def _send(self, method:str, url:str, send, deadline:float, idempotent:bool, endpoint:str, retry, streamed:bool, kwargs:dict):
+        import asyncio, httpx
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlparse(url).netloc
+        expires_at = current_deadline(deadline)
+        retry = self.retry if retry is None else retry or None
+        if not _replayable(kwargs):
+            retry = None
+        info = _start_info(self.hooks, method, url, endpoint)
+        attempt = 0
+        response = None
+        try:
+            while True:
+                timeout = _attempt_timeout(kwargs["timeout"], expires_at, url)
+                probe = self.circuit_breaker.before_request(host) if self.circuit_breaker else False
+                try:
+                    response = await send(**{**kwargs, "timeout": timeout})
+                except (httpx.TransportError, ConnectionError, TimeoutError) as e:
+                    if self.circuit_breaker:
+                        self.circuit_breaker.record_failure(host)
+                    if retry and retry.should_retry_error(method, attempt, idempotent) and _circuit_closed(self.circuit_breaker, host):
+                        delay = retry.backoff(attempt)
+                        if _fits_deadline(expires_at, delay):
+                            await asyncio.sleep(delay)
+                            attempt += 1
+                            continue
+                    if expires_at is not None and time.monotonic() >= expires_at:
+                        raise DeadlineExceeded(f'Deadline exceeded for request to "{url}"') from e
+                    raise
+                except BaseException:
+                    # any other error (or a cancellation) must not leave the probe pending, it would keep the circuit open for good
+                    if probe:
+                        self.circuit_breaker.release_probe(host)
+                    raise
+                if self.circuit_breaker:
+                    if response.status_code >= 500:
+                        self.circuit_breaker.record_failure(host)
+                    else:
+                        self.circuit_breaker.record_success(host)
+                if retry and retry.should_retry(method, response.status_code, attempt, idempotent) and _circuit_closed(self.circuit_breaker, host):
+                    delay = retry.backoff(attempt, response.headers.get("retry-after"))
+                    if _fits_deadline(expires_at, delay):
+                        await response.aclose()
+                        await asyncio.sleep(delay)
+                        attempt += 1
+                        continue
+                response.retries = attempt
+                return response
+        except Exception as e:
+            if info is not None:
+                info.error = e
+            raise
+        finally:
+            if info is not None:
+                _finish_info(self.hooks, info, response, attempt, streamed)
+
+
+    async def request(self, method:str, url:str, deadline:float=None, idempotent:bool=None, endpoint:str=None, retry:RetryPolicy=None, **kwargs):
+        async def send(**options):
+            return await self.client.request(method, url, **options)
+        return await self._send(method, url, send, deadline, idempotent, endpoint, retry, False, kwargs)
+
+
+    async def stream(self, method:str, url:str, deadline:float=None, idempotent:bool=None, endpoint:str=None, retry:RetryPolicy=None, **kwargs):
+        async def send(**options):
+            request = self.client.build_request(method, url, **options)
+            return AsyncStreamedResponse(await self.client.send(request, stream=True))
+        return await self._send(method, url, send, deadline, idempotent, endpoint, retry, True, kwargs)
+
+
+    async def get(self, url:str, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+
+    async def post(self, url:str, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+
+    async def delete(self, url:str, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+
+    async def aclose(self):
+        # closes the client of the running loop, call it before the loop ends (e.g. at the end of the coroutine passed to asyncio.run)
+        import asyncio
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+
+_default_async_transport = None
+
+
+def get_default_async_transport():
+    global _default_async_transport
+    if _default_async_transport is None:
+        _default_async_transport = AsyncTransport()
+    return _default_async_transport
+
+
+def set_default_async_transport(transport:AsyncTransport):
+    global _default_async_transport
+    _default_async_transport = transport
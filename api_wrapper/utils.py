@@ -1,20 +1,41 @@
 class ApiException(Exception):
     _api_name = None
+    _api_classes = {}
 
     @classmethod
     def set_api_name(cls, api_name):
         cls._api_name = api_name
 
+    @classmethod
+    def for_api(cls, api_name):
+        # one subclass per client (HassAPIException, ...), so the prefix no longer depends on which module was imported last
+        # the subclasses live in this module's namespace so pickle can find them by name
+        if api_name not in cls._api_classes:
+            name = f"{api_name}Exception"
+            subclass = type(name, (cls,), {"_api_name": api_name, "__module__": __name__, "__qualname__": name})
+            cls._api_classes[api_name] = globals()[name] = subclass
+        return cls._api_classes[api_name]
+
     def __init__(self, message):
         self.message = message
         super().__init__(self.format_message())
 
+    def __reduce__(self):
+        # rebuilt through for_api, a fresh process (ProcessPoolExecutor with spawn) may not have created the subclass yet
+        return _rebuild_exception, (self._api_name, self.message)
+
     def format_message(self):
         if self._api_name is None:
-            raise Exception(self.message)
-        raise Exception (f"\033[94m[{self._api_name}]\033[0m {self.message}")
-    
+            return self.message
+        return f"\033[94m[{self._api_name}]\033[0m {self.message}"
+
     class MissingAccessToken(Exception):
         def __init__(self, auth_class):
             message = f"Please provide an access token. You can get one by using the '{auth_class}' class."
-            super().__init__(ApiException(message))
\ No newline at end of file
+            super().__init__(ApiException(message))
+
+
+def _rebuild_exception(api_name, message):
+    if api_name is None:
+        return ApiException(message)
+    return ApiException.for_api(api_name)(message)
@@ -0,0 +1,37 @@
+import argparse, json, sys
+
+from .scenarios import SCENARIOS, run, compare
+from .stubs import StubConfig
+
+
+def main(argv:list=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Runs the api_wrapper clients against local stub servers and prints a JSON report.")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="scenario to run, repeat for several (default: all)")
+    parser.add_argument("--items", type=int, default=1000, help="size of the served collection")
+    parser.add_argument("--item-bytes", type=int, default=512, help="text padding per item")
+    parser.add_argument("--latency", type=float, default=2, help="stub latency per request in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="random extra latency per request in ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="share of requests answered with 503")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", help="write the report to this file instead of stdout")
+    parser.add_argument("--compare", help="baseline report, ratios against it are added under 'comparison'")
+    args = parser.parse_args(argv)
+
+    config = StubConfig(latency=args.latency / 1000, jitter=args.jitter / 1000, error_rate=args.error_rate, items=args.items, item_bytes=args.item_bytes)
+    report = run(args.scenario, config, args.concurrency, args.repeat, args.warmup)
+    if args.compare:
+        with open(args.compare) as file:
+            report["comparison"] = compare(json.load(file), report)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
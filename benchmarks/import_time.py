@@ -0,0 +1,74 @@
+# import-time regression benchmark, every statement is timed in a fresh interpreter
+import argparse, json, os, statistics, subprocess, sys
+
+
+STATEMENTS = {
+    "package": "import api_wrapper",
+    "HassAPI": "from api_wrapper import HassAPI",
+    "GroqAPI": "from api_wrapper import GroqAPI",
+    "FreshRssAPI": "from api_wrapper import FreshRssAPI",
+    "TickTickAPI": "from api_wrapper import TickTickAPI",
+    "PocketAPI": "from api_wrapper import PocketAPI",
+    "all": "from api_wrapper import *"
+}
+
+# modules worth knowing about when they show up in an import
+WATCHED = ("requests", "urllib3", "httpx", "asyncio", "sqlite3", "hashlib", "tempfile", "orjson", "msgspec", "websockets", "opentelemetry")
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+import json
+print(json.dumps({{"seconds": elapsed, "watched": sorted({{name.split(".")[0] for name in sys.modules}} & set({watched!r}))}}))
+"""
+
+
+def measure(statement:str, repeat:int=10):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))}
+    samples = []
+    watched = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", _PROBE.format(statement=statement, watched=WATCHED)], env=env, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output)
+        samples.append(result["seconds"] * 1000)
+        watched = result["watched"]
+    return {"statement": statement, "median_ms": statistics.median(samples), "min_ms": min(samples), "max_ms": max(samples), "loaded": watched}
+
+
+def run(names:list=None, repeat:int=10):
+    return {name: measure(STATEMENTS[name], repeat) for name in (names or STATEMENTS)}
+
+
+def check(report:dict, budgets:dict):
+    # budgets: {name: milliseconds}, returns the statements whose median exceeded their budget
+    return {name: report[name]["median_ms"] for name, budget in budgets.items() if name in report and report[name]["median_ms"] > budget}
+
+
+def main(argv:list=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.import_time", description="Times api_wrapper imports in fresh interpreters and prints a JSON report.")
+    parser.add_argument("--statement", action="append", choices=list(STATEMENTS), help="import to time, repeat for several (default: all)")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--budget", action="append", default=[], metavar="NAME=MS", help="fail when the median of NAME exceeds MS milliseconds")
+    parser.add_argument("--output", help="write the report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run(args.statement, args.repeat)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+    budgets = {name: float(ms) for name, ms in (budget.split("=", 1) for budget in args.budget)}
+    exceeded = check(report, budgets)
+    if exceeded:
+        sys.stderr.write(f"Import time budget exceeded: {exceeded}\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
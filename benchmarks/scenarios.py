@@ -0,0 +1,162 @@
+import platform, statistics, sys, threading, time, tracemalloc
+from datetime import datetime, timezone
+
+from api_wrapper import Transport, RetryPolicy, HassAPI, GroqAPI, FreshRssAPI, TickTickAPI, PocketAPI
+from api_wrapper.instrumentation import Hooks
+
+from .stubs import StubConfig, StubProcess
+
+
+class _RequestLog(Hooks):
+    def __init__(self):
+        self.durations = []
+        self.errors = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+
+    def after_request(self, info):
+        with self._lock:
+            self.durations.append(info.duration)
+            self.retries += info.retries
+            if info.error is not None or (info.status or 0) >= 400:
+                self.errors += 1
+
+
+def _percentile(values:list, percentile:float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(percentile / 100 * len(values)) - 1))]
+
+## Scenarios
+# each one points a client at the stub url and returns the number of operations it performed
+
+def hass_states(url:str, transport:Transport, config:StubConfig, concurrency:int):
+    api = HassAPI(url, "bench", transport=transport)
+    return len(api.get_states().states)
+
+
+def pocket_paging(url:str, transport:Transport, config:StubConfig, concurrency:int):
+    api = PocketAPI("bench", "bench", transport=transport)
+    api.base_url = f"{url}/v3"
+    return sum(1 for _ in api.iter_items(detailType="complete", page_size=30, prefetch=concurrency))
+
+
+def ticktick_subtree(url:str, transport:Transport, config:StubConfig, concurrency:int):
+    api = TickTickAPI("bench", transport=transport)
+    api.base_url = url
+    report = api.wont_do_subtree("bench", f"{0:024x}", max_workers=concurrency)
+    return sum(1 for result in report.values() if result["status"] == "success")
+
+
+def freshrss_backlog(url:str, transport:Transport, config:StubConfig, concurrency:int):
+    api = FreshRssAPI(url, "bench", "bench", transport=transport)
+    return sum(1 for _ in api.iter_items(read=False, max_workers=concurrency))
+
+
+def freshrss_paging(url:str, transport:Transport, config:StubConfig, concurrency:int):
+    api = FreshRssAPI(url, "bench", "bench", transport=transport)
+    return sum(1 for _ in api.iter_items())
+
+
+def groq_concurrent(url:str, transport:Transport, config:StubConfig, concurrency:int):
+    api = GroqAPI("bench", "bench-model", 0.7, 64, transport=transport)
+    api.root_url = f"{url}/openai/v1"
+    messages_list = [[{"role": "system", "content": "Answer briefly."}, {"role": "user", "content": f"Question {index}"}] for index in range(config.items)]
+    results = api.batch_chat_completion(messages_list, max_workers=concurrency, return_exceptions=True)
+    return sum(1 for result in results if not isinstance(result, Exception))
+
+
+SCENARIOS = {
+    "hass_states": ("hass", hass_states),
+    "pocket_paging": ("pocket", pocket_paging),
+    "ticktick_subtree": ("ticktick", ticktick_subtree),
+    "freshrss_backlog": ("fever", freshrss_backlog),
+    "freshrss_paging": ("fever", freshrss_paging),
+    "groq_concurrent": ("groq", groq_concurrent)
+}
+
+## Runner
+
+def _transport(concurrency:int, log:_RequestLog):
+    # short backoff so injected errors cost retries rather than sleep, no breaker so error runs stay comparable
+    return Transport(pool_maxsize=max(10, concurrency), retry=RetryPolicy(backoff_factor=0.005, max_backoff=0.05), circuit_breaker=False, hooks=[log])
+
+
+def run_scenario(name:str, config:StubConfig=None, concurrency:int=8, repeat:int=5, warmup:int=1):
+    kind, scenario = SCENARIOS[name]
+    config = config or StubConfig()
+    runs = []
+    log = _RequestLog()
+    with StubProcess(kind, config) as stub:
+        for index in range(warmup + repeat):
+            run_log = log if index >= warmup else _RequestLog()
+            with _transport(concurrency, run_log) as transport:
+                start = time.perf_counter()
+                ops = scenario(stub.url, transport, config, concurrency)
+                elapsed = time.perf_counter() - start
+            if index >= warmup:
+                runs.append({"ops": ops, "seconds": elapsed, "ops_per_sec": ops / elapsed if elapsed else None})
+        # tracemalloc slows allocations down, so memory is measured in a separate run
+        with _transport(concurrency, _RequestLog()) as transport:
+            tracemalloc.start()
+            try:
+                scenario(stub.url, transport, config, concurrency)
+                peak_memory = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    return {
+        "ops": runs[-1]["ops"],
+        "runs": runs,
+        "seconds": statistics.median(run["seconds"] for run in runs),
+        "ops_per_sec": statistics.median(run["ops_per_sec"] for run in runs),
+        "requests": len(log.durations) // repeat,
+        "errors": log.errors,
+        "retries": log.retries,
+        "request_p50_ms": _ms(_percentile(log.durations, 50)),
+        "request_p99_ms": _ms(_percentile(log.durations, 99)),
+        "peak_memory_bytes": peak_memory
+    }
+
+
+def _ms(seconds:float):
+    return None if seconds is None else seconds * 1000
+
+
+def _package_version():
+    try:
+        from importlib.metadata import version
+        return version("api_wrapper")
+    except Exception:
+        return None
+
+
+def run(scenarios:list=None, config:StubConfig=None, concurrency:int=8, repeat:int=5, warmup:int=1):
+    config = config or StubConfig()
+    return {
+        "meta": {
+            "api_wrapper": _package_version(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "concurrency": concurrency,
+            "repeat": repeat,
+            "stub": config.to_dict()
+        },
+        "scenarios": {name: run_scenario(name, config, concurrency, repeat, warmup) for name in (scenarios or SCENARIOS)}
+    }
+
+
+def compare(baseline:dict, report:dict):
+    # ratio > 1 means the new report is faster (ops/sec) or slower (p99, memory)
+    result = {}
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        result[name] = {
+            key: current[key] / previous[key] if current.get(key) and previous.get(key) else None
+            for key in ("ops_per_sec", "request_p50_ms", "request_p99_ms", "peak_memory_bytes")
+        }
+    return result
@@ -0,0 +1,324 @@
+# local stand-ins for the endpoints the wrappers call, the responses only carry the fields the wrappers read
+import json, multiprocessing, random, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class StubConfig:
+    def __init__(self, latency:float=0.002, jitter:float=0.0, error_rate:float=0.0, error_status:int=503, items:int=1000, item_bytes:int=512, seed:int=0):
+        # latency/jitter in seconds per request, error_rate: share of requests answered with `error_status`,
+        # items: size of the served collection (Pocket list, unread backlog, task tree, entities), item_bytes: text padding per item
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.items = items
+        self.item_bytes = item_bytes
+        self.seed = seed
+
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def _padding(item_bytes:int, index:int):
+    return (f"{index} lorem ipsum dolor sit amet " * (item_bytes // 28 + 1))[:item_bytes]
+
+
+class HassStub:
+    def __init__(self, config:StubConfig):
+        self.states = [{
+            "entity_id": f"sensor.bench_{index}",
+            "state": str(index % 40),
+            "attributes": {"friendly_name": f"Bench {index}", "description": _padding(config.item_bytes, index)},
+            "last_changed": "2024-01-01T00:00:00+00:00",
+            "last_updated": "2024-01-01T00:00:00+00:00"
+        } for index in range(config.items)]
+        self.by_id = {state["entity_id"]: state for state in self.states}
+
+
+    def handle(self, method:str, path:str, query:dict, body:bytes):
+        if path == "/api/states":
+            return 200, self.states
+        if path.startswith("/api/states/"):
+            state = self.by_id.get(path.removeprefix("/api/states/"))
+            return (200, state) if state else (404, {"message": "Entity not found."})
+        if path.startswith("/api/services/"):
+            return 200, []
+        if path == "/api/template":
+            return 200, "0"
+        return 404, {"message": "Not found"}
+
+
+class GroqStub:
+    def __init__(self, config:StubConfig):
+        self.content = _padding(config.item_bytes, 0)
+
+
+    def handle(self, method:str, path:str, query:dict, body:bytes):
+        if path == "/openai/v1/models":
+            return 200, {"object": "list", "data": [{"id": "bench-model", "object": "model"}]}
+        if path == "/openai/v1/chat/completions":
+            data = json.loads(body or b"{}")
+            return 200, {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": data.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": len(self.content) // 4, "total_tokens": 10 + len(self.content) // 4}
+            }
+        return 404, {"error": {"message": "Not found"}}
+
+
+class FeverStub:
+    def __init__(self, config:StubConfig):
+        self.items = {index: {
+            "id": index,
+            "feed_id": index % 10 + 1,
+            "title": f"Item {index}",
+            "author": "bench",
+            "html": _padding(config.item_bytes, index),
+            "url": f"https://example.com/items/{index}",
+            "is_saved": 1 if index % 20 == 0 else 0,
+            "is_read": 0,
+            "created_on_time": 1700000000 + index
+        } for index in range(1, config.items + 1)}
+        self.oldest = sorted(self.items)
+        self.newest = self.oldest[::-1]
+
+
+    def handle(self, method:str, path:str, query:dict, body:bytes):
+        if path != "/api/fever.php" or "api" not in query:
+            return 404, {}
+        response = {"api_version": 3, "auth": 1}
+        if "unread_item_ids" in query:
+            response["unread_item_ids"] = ",".join(str(item_id) for item_id in self.newest)
+        if "saved_item_ids" in query:
+            response["saved_item_ids"] = ",".join(str(item_id) for item_id in self.newest if self.items[item_id]["is_saved"])
+        if "groups" in query:
+            response["groups"] = [{"id": 1, "title": "One"}, {"id": 2, "title": "Two"}]
+        if "feeds" in query:
+            response["feeds"] = [{"id": feed_id, "title": f"Feed {feed_id}", "url": f"https://example.com/{feed_id}.xml"} for feed_id in range(1, 11)]
+            response["feeds_groups"] = [{"group_id": 1, "feed_ids": "1,2,3,4,5"}, {"group_id": 2, "feed_ids": "6,7,8,9,10"}]
+        if "items" in query:
+            if "with_ids" in query:
+                ids = [int(item_id) for item_id in query["with_ids"][0].split(",") if item_id]
+                response["items"] = [self.items[item_id] for item_id in ids if item_id in self.items]
+            else:
+                # like freshrss: since_id pages ascending, max_id descending, neither returns the lowest ids
+                if "max_id" in query:
+                    max_id = int(query["max_id"][0])
+                    ids = [item_id for item_id in self.newest if item_id < max_id]
+                else:
+                    since_id = int(query["since_id"][0]) if "since_id" in query else 0
+                    ids = [item_id for item_id in self.oldest if item_id > since_id]
+                response["items"] = [self.items[item_id] for item_id in ids[:50]]
+            response["total_items"] = len(self.items)
+        return 200, response
+
+
+class TickTickStub:
+    def __init__(self, config:StubConfig, fanout:int=4):
+        # one project holding a tree of `items` tasks, task 0 is the root
+        self.project_id = "bench"
+        self.tasks = [{
+            "id": f"{index:024x}",
+            "projectId": self.project_id,
+            "title": f"Task {index}",
+            "content": _padding(config.item_bytes, index),
+            "status": 0,
+            "sortOrder": index,
+            **({"parentId": f"{(index - 1) // fanout:024x}"} if index else {})
+        } for index in range(config.items)]
+        self.by_id = {task["id"]: task for task in self.tasks}
+
+
+    def handle(self, method:str, path:str, query:dict, body:bytes):
+        parts = path.strip("/").split("/")
+        if parts[:3] != ["open", "v1", "project"] and parts[:3] != ["open", "v1", "task"]:
+            return 404, {}
+        if method == "GET" and path == "/open/v1/project":
+            return 200, [{"id": self.project_id, "name": "Bench"}]
+        if method == "GET" and len(parts) == 5 and parts[4] == "data":
+            return 200, {"project": {"id": self.project_id, "name": "Bench"}, "tasks": self.tasks, "columns": []}
+        if method == "POST" and parts[2] == "task" and len(parts) == 4:
+            # like ticktick the full task is returned, the stored tasks stay untouched so repeated runs see the same tree
+            return 200, {**self.by_id.get(parts[3], {}), **json.loads(body or b"{}"), "id": parts[3]}
+        if method == "POST" and len(parts) == 7 and parts[6] == "complete":
+            return 200, None
+        if method == "DELETE":
+            return 200, None
+        return 404, {}
+
+
+class PocketStub:
+    def __init__(self, config:StubConfig):
+        self.items = [{
+            "item_id": str(index),
+            "resolved_id": str(index),
+            "given_url": f"https://example.com/articles/{index}",
+            "resolved_url": f"https://example.com/articles/{index}",
+            "given_title": f"Article {index}",
+            "resolved_title": f"Article {index}",
+            "favorite": "1" if index % 10 == 0 else "0",
+            "status": "0",
+            "excerpt": _padding(config.item_bytes, index),
+            "word_count": "1200",
+            "time_added": str(1700000000 + index),
+            "time_updated": str(1700000000 + index),
+            "sort_id": index,
+            "tags": {"bench": {"item_id": str(index), "tag": "bench"}} if index % 3 == 0 else {}
+        } for index in range(1, config.items + 1)]
+
+
+    def handle(self, method:str, path:str, query:dict, body:bytes):
+        if path == "/v3/get":
+            data = json.loads(body or b"{}")
+            offset, count = int(data.get("offset", 0)), int(data.get("count", 30))
+            page = self.items[offset:offset + count]
+            return 200, {"status": 1, "complete": 1, "list": {item["item_id"]: item for item in page} or [], "since": 1700000000}
+        if path == "/v3/send":
+            actions = json.loads(body or b"{}").get("actions", [])
+            return 200, {"status": 1, "action_results": [True] * len(actions)}
+        return 404, {}
+
+
+STUBS = {
+    "hass": HassStub,
+    "groq": GroqStub,
+    "fever": FeverStub,
+    "ticktick": TickTickStub,
+    "pocket": PocketStub
+}
+
+
+def _handler(stub, config:StubConfig):
+    rng = random.Random(config.seed)
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive, so the client connection pools behave like against the real services
+        protocol_version = "HTTP/1.1"
+        # headers and body go out as separate writes, Nagle would hold the body back for a delayed ack
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def handle_request(self, method:str):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            with rng_lock:
+                delay = config.latency + (rng.uniform(0, config.jitter) if config.jitter else 0)
+                failed = config.error_rate and rng.random() < config.error_rate
+            if delay:
+                time.sleep(delay)
+            if failed:
+                status, payload, headers = config.error_status, {"error": "stub failure"}, {"Retry-After": "0"}
+            else:
+                url = urlparse(self.path)
+                status, payload = stub.handle(method, url.path, parse_qs(url.query, keep_blank_values=True), body)
+                headers = {}
+            data = b"" if payload is None else json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self.handle_request("GET")
+
+        def do_POST(self):
+            self.handle_request("POST")
+
+        def do_DELETE(self):
+            self.handle_request("DELETE")
+
+    return Handler
+
+
+class StubServer:
+    def __init__(self, kind:str, config:StubConfig=None, host:str="127.0.0.1", port:int=0):
+        self.kind = kind
+        self.config = config or StubConfig()
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _handler(STUBS[self.kind](self.config), self.config))
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def _serve(kind:str, config:StubConfig, host:str, ports):
+    server = StubServer(kind, config, host).start()
+    ports.put(server.port)
+    server._thread.join()
+
+
+class StubProcess:
+    # runs a stub server in its own process, so it does not compete with the measured client for the GIL
+    def __init__(self, kind:str, config:StubConfig=None, host:str="127.0.0.1"):
+        self.kind = kind
+        self.config = config or StubConfig()
+        self.host = host
+        self.port = None
+        self._process = None
+
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+
+    def start(self):
+        ports = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=_serve, args=(self.kind, self.config, self.host, ports), daemon=True)
+        self._process.start()
+        self.port = ports.get(timeout=30)
+        return self
+
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, *args):
+        self.stop()
@@ -11,11 +11,19 @@ setup(
     author="stieglthomas",
     author_email="contact@stieglthomas.de",
     url="https://github.com/stieglthomas/api_wrapper",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     install_requires=requirements,
+    extras_require={
+        "http2": ["httpx[http2]"],
+        "async": ["httpx"],
+        "websocket": ["websockets"],
+        "otel": ["opentelemetry-api"],
+        "orjson": ["orjson"],
+        "msgspec": ["msgspec"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.9',
 )
\ No newline at end of file